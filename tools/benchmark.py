@@ -0,0 +1,254 @@
+# C:\summer\trafficlight-lite\tools\benchmark.py
+"""
+재현 가능한 성능 벤치마크
+1) 합성 영상: 신호등(가로형 3구, 빨/노/초 순환)을 크기 / 개수 / 해상도 별로 그린 결정적(seed 고정) 영상 → --work_dir 에 캐시
+   --video 로 녹화 영상도 같이 측정 가능
+2) 측정:
+   - predict : TrafficLightDetector.predict (batch 1) / predict_batch (batch > 1) 프레임당 latency
+   - pipeline: video_trafficlight_system.main (headless, --profile_json) 전체 루프 FPS + stage 별 p50/p95
+   조합: --devices x --imgsz x --batch (+ --modes serial,pipeline)
+3) 결과 JSON (--out). --baseline 과 비교해서 FPS 가 --max_regress 보다 많이 떨어지면 exit 1
+
+    python benchmark.py --weights ..\\best.pt --devices 0,cpu --imgsz 384,640 --batch 1,8 --out bench.json
+    python benchmark.py --weights ..\\best.pt --baseline bench_baseline.json --max_regress 0.10
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import video_trafficlight_system as vts
+from detector_backends import BACKENDS
+from trafficlight_detector import TrafficLightDetector
+
+# name: (W, H, 신호등 개수, 등(lamp) 반지름 px)
+SCENES = {
+    "360p_large_1":   (640, 360, 1, 14),
+    "720p_medium_4":  (1280, 720, 4, 9),
+    "720p_small_12":  (1280, 720, 12, 5),
+    "1080p_small_8":  (1920, 1080, 8, 6),
+}
+LAMP_COLORS = [(0, 0, 255), (0, 200, 255), (0, 220, 0)]  # red, yellow, green (BGR)
+PHASE_FRAMES = [45, 12, 45]                              # 프레임 수 (30fps 기준 1.5s / 0.4s / 1.5s)
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Traffic-light benchmark (synthetic + recorded video)")
+    p.add_argument("--weights", type=str, default="C:/summer/trafficlight-lite/best.pt")
+    p.add_argument("--backend", type=str, default="torch", choices=BACKENDS)
+    p.add_argument("--devices", type=str, default="0", help="Comma separated, e.g. 0,cpu")
+    p.add_argument("--imgsz", type=str, default="640", help="Comma separated")
+    p.add_argument("--batch", type=str, default="1,8", help="Comma separated")
+    p.add_argument("--modes", type=str, default="serial,pipeline", help="Pipeline run modes (serial, pipeline)")
+    p.add_argument("--scenes", type=str, default=",".join(SCENES), help=f"Synthetic scenes: {', '.join(SCENES)}")
+    p.add_argument("--video", type=str, default="", help="Also benchmark this recorded video")
+    p.add_argument("--frames", type=int, default=150, help="Frames per video")
+    p.add_argument("--repeat", type=int, default=3, help="predict timing repeats (median is reported)")
+    p.add_argument("--skip", type=str, default="", help="Skip parts: predict,pipeline")
+    p.add_argument("--work_dir", type=str, default="bench_videos")
+    p.add_argument("--out", type=str, default="bench_results.json")
+    p.add_argument("--baseline", type=str, default="", help="Compare with this results JSON")
+    p.add_argument("--max_regress", type=float, default=0.10, help="Allowed FPS drop vs baseline (0.10 = 10%%)")
+    return p.parse_args()
+
+
+# =========================
+# 1) Synthetic video
+# =========================
+def make_scene_video(path: Path, W: int, H: int, n_lights: int, radius: int, frames: int,
+                     seed: int = 0, fps: float = 30.0):
+    """결정적 합성 영상: 하늘/도로 배경 + 가로형 3구 신호등 n 개 (각자 위상 다름) + 느린 카메라 흔들림 + 노이즈"""
+    rng = np.random.default_rng(seed)
+    bg = np.zeros((H, W, 3), np.uint8)
+    sky = np.linspace(200, 120, H // 2).astype(np.uint8)
+    bg[:H // 2] = np.stack([sky, sky - 20, sky - 60], axis=1)[:, None, :]
+    bg[H // 2:] = (70, 70, 70)
+    cv2.line(bg, (W // 2, H // 2), (W // 2, H), (230, 230, 230), max(2, W // 200))
+
+    r, gap = radius, int(radius * 0.6)
+    hw, hh = 3 * 2 * r + 4 * gap, 2 * r + 2 * gap  # housing 크기
+    lights = []
+    for _ in range(n_lights):
+        x = int(rng.integers(0, max(1, W - hw)))
+        y = int(rng.integers(0, max(1, H // 2 - hh)))
+        lights.append((x, y, int(rng.integers(0, sum(PHASE_FRAMES)))))
+    noise = rng.integers(0, 12, (4, H, W, 3), dtype=np.uint8)  # 4장 순환 (생성 속도)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    vw = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (W, H))
+    if not vw.isOpened():
+        raise RuntimeError(f"Failed to open video writer: {path}")
+    cycle = sum(PHASE_FRAMES)
+    for i in range(frames):
+        f = bg.copy()
+        dx = int(round(4 * np.sin(i / 20.0)))
+        dy = int(round(2 * np.sin(i / 13.0)))
+        for x, y, ph in lights:
+            t = (i + ph) % cycle
+            lit = 0 if t < PHASE_FRAMES[0] else (1 if t < PHASE_FRAMES[0] + PHASE_FRAMES[1] else 2)
+            x0, y0 = x + dx, y + dy
+            cv2.rectangle(f, (x0, y0), (x0 + hw, y0 + hh), (25, 25, 25), -1)
+            for k in range(3):
+                c = (x0 + gap + r + k * (2 * r + gap), y0 + gap + r)
+                cv2.circle(f, c, r, LAMP_COLORS[k] if k == lit else (45, 45, 45), -1, cv2.LINE_AA)
+        vw.write(cv2.add(f, noise[i % 4]))
+    vw.release()
+
+
+def scene_videos(a) -> dict[str, Path]:
+    videos = {}
+    for name in [s.strip() for s in a.scenes.split(",") if s.strip()]:
+        if name not in SCENES:
+            raise ValueError(f"Unknown scene: {name} (choose from {', '.join(SCENES)})")
+        W, H, n, r = SCENES[name]
+        path = Path(a.work_dir) / f"{name}_{a.frames}f.mp4"
+        if not path.exists():
+            make_scene_video(path, W, H, n, r, a.frames, seed=sum(map(ord, name)))
+            print(f"[GEN] {path}")
+        videos[name] = path
+    if a.video:
+        videos[Path(a.video).stem] = Path(a.video)
+    return videos
+
+
+def read_frames(path: Path, n: int) -> list[np.ndarray]:
+    cap = cv2.VideoCapture(str(path))
+    frames = vts.read_batch(cap, n)
+    cap.release()
+    return frames
+
+
+# =========================
+# 2) Timing
+# =========================
+def bench_predict(det: TrafficLightDetector, frames: list[np.ndarray], imgsz: int, batch: int,
+                  repeat: int) -> dict:
+    """프레임당 latency (ms). batch 1 → predict(), batch > 1 → predict_batch()"""
+    det.predict(frames[0], imgsz=imgsz)  # warm-up
+    runs = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        if batch == 1:
+            for f in frames:
+                det.predict(f, imgsz=imgsz)
+        else:
+            det.predict_batch(frames, imgsz=imgsz, batch_size=batch)
+        runs.append((time.perf_counter() - t0) * 1000.0 / len(frames))
+    ms = float(np.median(runs))
+    return {"ms_per_frame": ms, "fps": 1000.0 / ms, "runs_ms": runs}
+
+
+def bench_pipeline(a, video: Path, device: str, imgsz: int, batch: int, mode: str) -> dict:
+    """video_trafficlight_system 전체 루프 (headless). 모델 로딩 제외, Profiler 요약 사용"""
+    with tempfile.TemporaryDirectory() as td:
+        prof_json = Path(td) / "profile.json"
+        argv = ["--weights", a.weights, "--backend", a.backend, "--source", str(video), "--device", device,
+                "--imgsz", str(imgsz), "--batch", str(batch), "--conf", "0.25", "--captions",
+                "--clock", "video", "--profile_json", str(prof_json)]
+        if mode == "pipeline":
+            argv.append("--pipeline")
+        vts.main(argv)
+        with open(prof_json, "r", encoding="utf-8") as f:
+            prof = json.load(f)
+    stages = {k: {"p50": v["p50"], "p95": v["p95"]} for k, v in prof["stages_ms"].items()}
+    return {"fps": prof["fps"], "ms_per_frame": 1000.0 / max(1e-6, prof["fps"]), "frames": prof["frames"],
+            "stages_ms": stages}
+
+
+# =========================
+# 3) Baseline compare
+# =========================
+def result_key(r: dict) -> str:
+    return "|".join(str(r[k]) for k in ("kind", "video", "device", "imgsz", "batch", "mode"))
+
+
+def compare(results: list[dict], baseline_path: str, max_regress: float) -> bool:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = {result_key(r): r for r in json.load(f)["results"]}
+    ok = True
+    print(f"\n{'case':<58}{'base fps':>10}{'now fps':>10}{'change':>9}")
+    for r in results:
+        b = base.get(result_key(r))
+        if b is None:
+            print(f"{result_key(r):<58}{'-':>10}{r['fps']:>10.1f}{'new':>9}")
+            continue
+        change = r["fps"] / max(1e-9, b["fps"]) - 1.0
+        bad = change < -max_regress
+        ok &= not bad
+        print(f"{result_key(r):<58}{b['fps']:>10.1f}{r['fps']:>10.1f}{change:>+8.1%}" + ("  REGRESSION" if bad else ""))
+    return ok
+
+
+def main():
+    a = parse_args()
+    if not Path(a.weights).exists():
+        raise FileNotFoundError(f"Weights not found: {a.weights}")
+    devices = [d.strip() for d in a.devices.split(",") if d.strip()]
+    imgszs = [int(x) for x in a.imgsz.split(",") if x.strip()]
+    batches = [int(x) for x in a.batch.split(",") if x.strip()]
+    modes = [m.strip() for m in a.modes.split(",") if m.strip()]
+    skip = {s.strip() for s in a.skip.split(",") if s.strip()}
+
+    videos = scene_videos(a)
+    results: list[dict] = []
+
+    if "predict" not in skip:
+        for device in devices:
+            for imgsz in imgszs:
+                det = TrafficLightDetector(a.weights, device=device, backend=a.backend, imgsz=imgsz,
+                                           classes_map=vts.ID_TO_NAME)
+                for name, path in videos.items():
+                    frames = read_frames(path, a.frames)
+                    for batch in batches:
+                        r = bench_predict(det, frames, imgsz, batch, a.repeat)
+                        results.append(dict(kind="predict", video=name, device=device, imgsz=imgsz,
+                                            batch=batch, mode="-", **r))
+                        print(f"[predict ] {name:<16} dev {device:<4} imgsz {imgsz:<5} batch {batch:<3} "
+                              f"{r['ms_per_frame']:7.2f} ms/frame  {r['fps']:7.1f} fps")
+
+    if "pipeline" not in skip:
+        for device in devices:
+            for imgsz in imgszs:
+                for name, path in videos.items():
+                    for batch in batches:
+                        for mode in modes:
+                            r = bench_pipeline(a, path, device, imgsz, batch, mode)
+                            results.append(dict(kind="pipeline", video=name, device=device, imgsz=imgsz,
+                                                batch=batch, mode=mode, **r))
+                            print(f"[pipeline] {name:<16} dev {device:<4} imgsz {imgsz:<5} batch {batch:<3} "
+                                  f"{mode:<9}{r['fps']:7.1f} fps")
+
+    try:
+        import torch  # 버전 기록용 (onnx / openvino 전용 CPU 머신에는 없을 수 있음)
+    except ImportError:
+        torch = None
+    out = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"), "platform": platform.platform(),
+            "python": platform.python_version(), "opencv": cv2.__version__,
+            "torch": torch.__version__ if torch is not None else None,
+            "cuda": torch.cuda.get_device_name(0) if torch is not None and torch.cuda.is_available() else None,
+            "weights": str(a.weights), "backend": a.backend, "frames": a.frames,
+        },
+        "results": results,
+    }
+    Path(a.out).parent.mkdir(parents=True, exist_ok=True)
+    with open(a.out, "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2)
+    print(f"\n[INFO] Results saved to: {a.out}")
+
+    if a.baseline:
+        if not compare(results, a.baseline, a.max_regress):
+            print(f"[FAIL] FPS regression > {a.max_regress:.0%} vs {a.baseline}")
+            sys.exit(1)
+        print(f"[PASS] No FPS regression > {a.max_regress:.0%} vs {a.baseline}")
+
+
+if __name__ == "__main__":
+    main()
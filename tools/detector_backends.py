@@ -0,0 +1,313 @@
+# C:\summer\trafficlight-lite\tools\detector_backends.py
+"""
+추론 백엔드: torch(ultralytics YOLO) / onnx(onnxruntime) / openvino
+- 모두 predict(images, imgsz, conf, iou) -> 이미지별 (xyxy float32 (N,4), conf float32 (N,), cls int (N,))
+- onnx / openvino 는 best.pt 에서 export (이미 있으면 재사용) + 자체 letterbox 전처리 / NMS
+- torch / ultralytics 는 필요할 때만 import (CPU 전용 머신에서 무거운 import 피하기)
+
+Parity check (torch 대비):
+    python detector_backends.py --weights best.pt --images datasets/etri_raw/val/images --backend onnx --device cpu
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "openvino")
+PRECISIONS = ("fp32", "int8")
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+Raw = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def empty_raw() -> Raw:
+    return np.zeros((0, 4), np.float32), np.zeros((0,), np.float32), np.zeros((0,), int)
+
+
+# =========================
+# Pre / post processing (ultralytics 와 같은 규칙)
+# =========================
+def letterbox(img: np.ndarray, size: int, color: int = 114) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """비율 유지 resize + 정사각형 padding → (img, gain, (pad_w, pad_h))"""
+    h, w = img.shape[:2]
+    r = min(size / h, size / w)
+    nw, nh = int(round(w * r)), int(round(h * r))
+    if (nw, nh) != (w, h):
+        img = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    dw, dh = (size - nw) / 2, (size - nh) / 2
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(color, color, color))
+    return img, r, (left, top)
+
+
+def to_blob(imgs: List[np.ndarray]) -> np.ndarray:
+    """BGR HWC uint8 리스트 → RGB NCHW float32 [0,1]"""
+    x = np.stack(imgs)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(x, dtype=np.float32) / 255.0
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thres: float) -> np.ndarray:
+    """greedy NMS (IoU > iou_thres 인 낮은 점수 박스 제거) → keep index (점수 내림차순)"""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        h = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_thres]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_yolov8(pred: np.ndarray, conf: float, iou: float, gain: float, pad: Tuple[int, int],
+                  shape: Tuple[int, int], max_det: int = 300, max_nms: int = 30000) -> Raw:
+    """YOLOv8 head 출력 (4+nc, A) → 원본 좌표 (xyxy, conf, cls). class 별 NMS (좌표 offset 방식)"""
+    p = pred.T
+    scores = p[:, 4:]
+    cls = scores.argmax(axis=1)
+    cf = scores[np.arange(len(cls)), cls]
+    m = cf > conf
+    if not m.any():
+        return empty_raw()
+    p, cls, cf = p[m], cls[m], cf[m]
+    if len(cf) > max_nms:
+        top = cf.argsort()[::-1][:max_nms]
+        p, cls, cf = p[top], cls[top], cf[top]
+
+    cx, cy, w, h = p[:, 0], p[:, 1], p[:, 2], p[:, 3]
+    xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    keep = nms(xyxy + (cls * 7680.0)[:, None], cf, iou)[:max_det]
+    xyxy, cf, cls = xyxy[keep], cf[keep], cls[keep]
+
+    # letterbox 좌표 → 원본 좌표
+    xyxy -= np.array([pad[0], pad[1], pad[0], pad[1]], np.float32)
+    xyxy /= gain
+    H, W = shape
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, W)
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, H)
+    return xyxy.astype(np.float32), cf.astype(np.float32), cls.astype(int)
+
+
+# =========================
+# Backends
+# =========================
+class TorchBackend:
+    """ultralytics YOLO(.pt) 그대로"""
+    name = "torch"
+
+    def __init__(self, weights: str, device: str = "0"):
+        from ultralytics import YOLO
+        self.model = YOLO(str(weights))
+        self.device = device
+
+    def predict(self, images: List[np.ndarray], imgsz: int, conf: float, iou: float) -> List[Raw]:
+        r = self.model.predict(images, imgsz=imgsz, conf=conf, iou=iou,
+                               device=self.device, verbose=False) or []
+        out = []
+        for i in range(len(images)):
+            boxes = r[i].boxes if i < len(r) else None
+            if boxes is None or boxes.xyxy is None or len(boxes) == 0:
+                out.append(empty_raw())
+                continue
+            out.append((boxes.xyxy.cpu().numpy(),
+                        boxes.conf.cpu().numpy(),
+                        boxes.cls.cpu().numpy().astype(int)))
+        return out
+
+
+class _ExportedBackend:
+    """export 된 모델 공통: letterbox(정사각형 imgsz) → run → decode"""
+    name = ""
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def predict(self, images: List[np.ndarray], imgsz: int, conf: float, iou: float) -> List[Raw]:
+        if not images:
+            return []
+        boxed = [letterbox(im, imgsz) for im in images]
+        pred = self._run(to_blob([b[0] for b in boxed]))
+        return [decode_yolov8(pred[i], conf, iou, gain, pad, im.shape[:2])
+                for i, (im, (_, gain, pad)) in enumerate(zip(images, boxed))]
+
+
+class OnnxBackend(_ExportedBackend):
+    name = "onnx"
+
+    def __init__(self, path: str, device: str = "cpu"):
+        import onnxruntime as ort
+        providers = ["CPUExecutionProvider"]
+        if device != "cpu" and "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "CUDAExecutionProvider")
+        self.session = ort.InferenceSession(str(path), providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVINOBackend(_ExportedBackend):
+    name = "openvino"
+
+    def __init__(self, path: str, device: str = "cpu"):
+        import openvino as ov
+        core = ov.Core()
+        xml = Path(path)
+        if xml.is_dir():
+            xml = next(xml.glob("*.xml"))
+        # CUDA 번호("0")는 OpenVINO 장치가 아님 → CPU. "GPU"/"AUTO" 등은 그대로
+        ov_device = device.upper() if device.upper() in ("GPU", "AUTO", "NPU") else "CPU"
+        self.compiled = core.compile_model(core.read_model(str(xml)), ov_device)
+        self.output = self.compiled.output(0)
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        return self.compiled(blob)[self.output]
+
+
+def exported_path(weights: str, backend: str, precision: str = "fp32") -> Path:
+    """ultralytics export 기본 출력 위치 (best.pt → best.onnx / best_openvino_model/)
+    INT8 은 quantize_int8.py 결과물 (best_int8.onnx / best_int8_openvino_model/)
+    """
+    w = Path(weights)
+    stem = w.stem if precision == "fp32" else f"{w.stem}_int8"
+    if backend == "onnx":
+        return w.parent / f"{stem}.onnx"
+    return w.parent / f"{stem}_openvino_model"
+
+
+def export_model(weights: str, backend: str, imgsz: int = 640) -> Path:
+    """best.pt → onnx / openvino (dynamic batch/shape). 결과물이 이미 있으면 그대로 사용"""
+    out = exported_path(weights, backend)
+    if out.exists():
+        return out
+    from ultralytics import YOLO
+    print(f"[INFO] Exporting {weights} → {backend} ...")
+    fmt = "onnx" if backend == "onnx" else "openvino"
+    return Path(YOLO(str(weights)).export(format=fmt, imgsz=imgsz, dynamic=True))
+
+
+def make_backend(backend: str, weights: str, device: str = "0", imgsz: int = 640, precision: str = "fp32"):
+    """--backend / --precision 값 → 백엔드 객체. weights 가 .pt 면 필요 시 export"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend} (choose from {', '.join(BACKENDS)})")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision} (choose from {', '.join(PRECISIONS)})")
+    if backend == "torch":
+        if precision != "fp32":
+            raise ValueError("INT8 needs --backend onnx or openvino (see quantize_int8.py)")
+        return TorchBackend(weights, device)
+    path = Path(weights)
+    if path.suffix == ".pt":
+        if precision == "int8":
+            path = exported_path(weights, backend, "int8")
+            if not path.exists():
+                raise FileNotFoundError(f"INT8 model not found: {path} (run quantize_int8.py first)")
+        else:
+            path = export_model(weights, backend, imgsz)
+    if backend == "onnx":
+        return OnnxBackend(str(path), device)
+    return OpenVINOBackend(str(path), device)
+
+
+# =========================
+# Parity check
+# =========================
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N,4) x (M,4) → (N,M) IoU"""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_raw(ref: Raw, test: Raw, iou_thres: float = 0.5) -> Tuple[int, List[float], List[float]]:
+    """같은 class + IoU >= iou_thres 로 greedy 매칭 → (매칭 수, conf 차이들, IoU들)"""
+    if len(ref[0]) == 0 or len(test[0]) == 0:
+        return 0, [], []
+    ious = box_iou(ref[0], test[0])
+    ious[ref[2][:, None] != test[2][None, :]] = 0.0
+    used = set()
+    n, dconf, mious = 0, [], []
+    for i in np.argsort(-ref[1]):
+        j = int(np.argmax(ious[i]))
+        if ious[i, j] >= iou_thres and j not in used:
+            used.add(j)
+            n += 1
+            dconf.append(abs(float(ref[1][i]) - float(test[1][j])))
+            mious.append(float(ious[i, j]))
+            ious[:, j] = 0.0
+    return n, dconf, mious
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Backend parity check (torch vs onnx/openvino)")
+    p.add_argument("--weights", type=str, default="C:/summer/trafficlight-lite/best.pt")
+    p.add_argument("--images", type=str, required=True, help="Folder of test images")
+    p.add_argument("--backend", type=str, default="onnx", choices=[b for b in BACKENDS if b != "torch"])
+    p.add_argument("--model", type=str, default="", help="Exported model path (default: export from --weights)")
+    p.add_argument("--device", type=str, default="cpu")
+    p.add_argument("--imgsz", type=int, default=640)
+    p.add_argument("--conf", type=float, default=0.25)
+    p.add_argument("--iou", type=float, default=0.7)
+    p.add_argument("--limit", type=int, default=200, help="Max images")
+    p.add_argument("--min_match", type=float, default=0.95, help="Fail if matched/torch boxes is below this")
+    return p.parse_args()
+
+
+def main():
+    a = parse_args()
+    imgs = sorted(p for p in Path(a.images).rglob("*") if p.suffix.lower() in IMG_EXTS)[:a.limit]
+    if not imgs:
+        print(f"[ERROR] No images in {a.images}")
+        sys.exit(1)
+
+    ref_be = make_backend("torch", a.weights, a.device)
+    test_be = make_backend(a.backend, a.model or a.weights, a.device, a.imgsz)
+
+    n_ref = n_test = n_match = 0
+    dconf: List[float] = []
+    ious: List[float] = []
+    t_ref = t_test = 0.0
+    for p in imgs:
+        im = cv2.imread(str(p), cv2.IMREAD_COLOR)
+        if im is None:
+            continue
+        t0 = time.perf_counter()
+        ref = ref_be.predict([im], a.imgsz, a.conf, a.iou)[0]
+        t1 = time.perf_counter()
+        test = test_be.predict([im], a.imgsz, a.conf, a.iou)[0]
+        t2 = time.perf_counter()
+        t_ref += t1 - t0
+        t_test += t2 - t1
+        m, dc, mi = match_raw(ref, test)
+        n_ref += len(ref[1])
+        n_test += len(test[1])
+        n_match += m
+        dconf += dc
+        ious += mi
+
+    rate = n_match / n_ref if n_ref else 1.0
+    print(f"[PARITY] images {len(imgs)} | torch boxes {n_ref} | {a.backend} boxes {n_test} | matched {n_match} ({rate:.1%})")
+    if dconf:
+        print(f"[PARITY] conf |diff| mean {np.mean(dconf):.4f} max {np.max(dconf):.4f} | IoU mean {np.mean(ious):.4f} min {np.min(ious):.4f}")
+    print(f"[PARITY] latency/img torch {1000 * t_ref / len(imgs):.1f} ms | {a.backend} {1000 * t_test / len(imgs):.1f} ms")
+    if rate < a.min_match:
+        print(f"[FAIL] match rate {rate:.1%} < {a.min_match:.1%}")
+        sys.exit(1)
+    print("[OK] backend matches torch")
+
+
+if __name__ == "__main__":
+    main()
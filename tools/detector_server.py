@@ -0,0 +1,297 @@
+# C:\summer\trafficlight-lite\tools\detector_server.py
+"""
+상주 추론 서버: 모델을 한 번만 올려 두고 (warm) 여러 클라이언트 요청을 micro-batch 로 묶어 처리
+- localhost TCP (Windows 포함 어디서나 동작)
+- 메시지: [4바이트 big-endian 헤더 길이][JSON 헤더][payload (raw BGR 프레임들, 헤더의 nbytes)]
+- 요청:  {"op": "predict", "imgsz": 640, "conf": 0.5(옵션), "iou": 0.7(옵션),
+          "images": [{"path": "a.jpg"} | {"shape": [H, W, 3]}, ...], "nbytes": N}
+- 응답:  {"ok": true, "results": [[{"class_id","class_name","conf","bbox"}, ...], ...]}  (TrafficLightDetector 형식)
+
+실행:
+    python detector_server.py --weights ..\\best.pt --device 0 --port 8765
+클라이언트:
+    python video_trafficlight_system.py --server 127.0.0.1:8765 ...
+    python predict_yolo.py --server 127.0.0.1:8765 --source <images>
+"""
+import argparse
+import json
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+
+from detector_backends import BACKENDS, PRECISIONS
+from trafficlight_detector import DetectionBatch, TrafficLightDetector
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+
+# =========================
+# Wire format
+# =========================
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if k == 0:
+            raise ConnectionError("connection closed")
+        got += k
+    return bytes(buf)
+
+
+def send_msg(sock: socket.socket, header: Dict[str, Any], payload: List[bytes] = ()):
+    payload = list(payload)
+    header = dict(header, nbytes=sum(len(p) for p in payload))
+    h = json.dumps(header).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(h)) + h)
+    for p in payload:
+        sock.sendall(p)
+
+
+def recv_msg(sock: socket.socket):
+    (n,) = struct.unpack(">I", _recv_exact(sock, 4))
+    header = json.loads(_recv_exact(sock, n).decode("utf-8"))
+    payload = _recv_exact(sock, header.get("nbytes", 0)) if header.get("nbytes", 0) else b""
+    return header, payload
+
+
+def parse_address(address: str):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+# =========================
+# Server
+# =========================
+class _Job:
+    __slots__ = ("images", "imgsz", "conf", "iou", "done", "result", "error")
+
+    def __init__(self, images, imgsz, conf, iou):
+        self.images = images
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Coalescer:
+    """동시에 들어온 요청들을 micro-batch 로 묶어 추론
+    - 첫 요청 도착 후 max_wait_ms 가 지나거나 이미지가 max_batch 장 모이면 실행
+    - (imgsz, conf, iou, 이미지 shape) 가 같은 요청끼리 한 번의 backend.predict 로
+      (shape 가 섞인 배치는 letterbox padding 이 달라짐 → 다른 클라이언트 요청에 따라 결과가 바뀌면 안 됨)
+    - 요청 안에 shape 가 섞여 있으면 그 요청만 단독 실행 (TrafficLightDetector 로 같은 배치를 돌린 결과와 동일)
+    """
+    def __init__(self, detector: TrafficLightDetector, max_batch: int = 16, max_wait_ms: float = 10.0):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.q: queue.Queue = queue.Queue()
+        self.batches = 0
+        self.images = 0
+        self.thread = threading.Thread(target=self._loop, name="coalescer", daemon=True)
+        self.thread.start()
+
+    def submit(self, images: List[np.ndarray], imgsz: int, conf: float, iou: float):
+        job = _Job(images, imgsz, conf, iou)
+        self.q.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _loop(self):
+        while True:
+            jobs = [self.q.get()]
+            n = len(jobs[0].images)
+            deadline = time.perf_counter() + self.max_wait
+            while n < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self.q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                n += len(job.images)
+
+            groups: Dict[tuple, List[_Job]] = {}
+            for job in jobs:
+                shapes = {im.shape for im in job.images}
+                shape = shapes.pop() if len(shapes) == 1 else id(job)
+                groups.setdefault((job.imgsz, job.conf, job.iou, shape), []).append(job)
+            for (imgsz, conf, iou, _), group in groups.items():
+                try:
+                    imgs = [im for job in group for im in job.images]
+                    raws = self.detector.backend.predict(imgs, imgsz=imgsz, conf=conf, iou=iou)
+                    dicts = DetectionBatch.from_raws(raws, 0, self.detector.classes_map).to_dicts()
+                    k = 0
+                    for job in group:
+                        job.result = dicts[k:k + len(job.images)]
+                        k += len(job.images)
+                    self.batches += 1
+                    self.images += len(imgs)
+                except Exception as e:
+                    for job in group:
+                        job.error = e
+                for job in group:
+                    job.done.set()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server: DetectorServer = self.server
+        sock = self.request
+        while True:
+            try:
+                header, payload = recv_msg(sock)
+            except (ConnectionError, OSError):
+                return
+            try:
+                op = header.get("op", "predict")
+                if op == "ping":
+                    send_msg(sock, {"ok": True, "batches": server.coalescer.batches,
+                                    "images": server.coalescer.images})
+                    continue
+                images, off = [], 0
+                for spec in header.get("images", []):
+                    if "path" in spec:
+                        im = cv2.imread(spec["path"], cv2.IMREAD_COLOR)
+                        if im is None:
+                            raise FileNotFoundError(f"Image not readable: {spec['path']}")
+                    else:
+                        shape = tuple(spec["shape"])
+                        nb = int(np.prod(shape))
+                        im = np.frombuffer(payload, np.uint8, nb, off).reshape(shape)
+                        off += nb
+                    images.append(im)
+                results = server.coalescer.submit(
+                    images, int(header.get("imgsz", server.imgsz)),
+                    float(header.get("conf", server.detector.conf)),
+                    float(header.get("iou", server.detector.iou)))
+                send_msg(sock, {"ok": True, "results": results})
+            except Exception as e:
+                send_msg(sock, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+class DetectorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: str, detector: TrafficLightDetector, imgsz: int,
+                 max_batch: int, max_wait_ms: float):
+        super().__init__(parse_address(address), _Handler)
+        self.detector = detector
+        self.imgsz = imgsz
+        self.coalescer = Coalescer(detector, max_batch, max_wait_ms)
+
+
+# =========================
+# Client
+# =========================
+class DetectorClient:
+    """detector_server 클라이언트. 연결 하나를 계속 재사용 (스레드마다 클라이언트 하나)"""
+    def __init__(self, address: str = DEFAULT_ADDRESS, timeout: float = 60.0):
+        self.sock = socket.create_connection(parse_address(address), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def close(self):
+        self.sock.close()
+
+    def _call(self, header: Dict[str, Any], payload: List[bytes] = ()):
+        send_msg(self.sock, header, payload)
+        resp, _ = recv_msg(self.sock)
+        if not resp.get("ok"):
+            raise RuntimeError(f"detector_server: {resp.get('error')}")
+        return resp
+
+    def ping(self) -> Dict[str, Any]:
+        return self._call({"op": "ping"})
+
+    def predict_batch(self, images: List[Any], imgsz: int = 640, conf: float = None,
+                      iou: float = None) -> List[List[Dict[str, Any]]]:
+        """BGR 프레임 또는 (서버에서 읽을 수 있는) 이미지 경로 → 이미지별 dict 리스트"""
+        specs, payload = [], []
+        for im in images:
+            if isinstance(im, str):
+                specs.append({"path": im})
+            else:
+                im = np.ascontiguousarray(im, dtype=np.uint8)
+                specs.append({"shape": list(im.shape)})
+                payload.append(memoryview(im).cast("B"))
+        header = {"op": "predict", "imgsz": imgsz, "images": specs}
+        if conf is not None:
+            header["conf"] = conf
+        if iou is not None:
+            header["iou"] = iou
+        return self._call(header, payload)["results"]
+
+    def predict(self, img, imgsz: int = 640) -> List[Dict[str, Any]]:
+        return self.predict_batch([img], imgsz)[0]
+
+
+class RemoteBackend:
+    """detector_backends 백엔드와 같은 predict 인터페이스로 서버 호출"""
+    name = "remote"
+
+    def __init__(self, address: str = DEFAULT_ADDRESS):
+        self.client = DetectorClient(address)
+
+    def predict(self, images: List[np.ndarray], imgsz: int, conf: float, iou: float):
+        out = []
+        for dets in self.client.predict_batch(images, imgsz, conf, iou):
+            if not dets:
+                out.append((np.zeros((0, 4), np.float32), np.zeros((0,), np.float32), np.zeros((0,), int)))
+                continue
+            out.append((np.array([d["bbox"] for d in dets], np.float32),
+                        np.array([d["conf"] for d in dets], np.float32),
+                        np.array([d["class_id"] for d in dets], int)))
+        return out
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Persistent traffic-light detector server")
+    p.add_argument("--weights", type=str, default="C:/summer/trafficlight-lite/best.pt")
+    p.add_argument("--backend", type=str, default="torch", choices=BACKENDS)
+    p.add_argument("--precision", type=str, default="fp32", choices=PRECISIONS)
+    p.add_argument("--device", type=str, default="0")
+    p.add_argument("--imgsz", type=int, default=640, help="Default imgsz when a request does not set one")
+    p.add_argument("--conf", type=float, default=0.25)
+    p.add_argument("--iou", type=float, default=0.7)
+    p.add_argument("--address", type=str, default=DEFAULT_ADDRESS, help="host:port to listen on")
+    p.add_argument("--max_batch", type=int, default=16, help="Max images per coalesced batch")
+    p.add_argument("--max_wait_ms", type=float, default=10.0, help="Max time to wait for more requests")
+    return p.parse_args()
+
+
+def main():
+    from video_trafficlight_system import ID_TO_NAME
+
+    a = parse_args()
+    detector = TrafficLightDetector(a.weights, device=a.device, conf_thres=a.conf, iou_thres=a.iou,
+                                    classes_map=ID_TO_NAME, backend=a.backend, imgsz=a.imgsz,
+                                    precision=a.precision)
+    # warm-up (첫 요청 지연 제거)
+    detector.predict(np.zeros((a.imgsz, a.imgsz, 3), np.uint8), imgsz=a.imgsz)
+
+    with DetectorServer(a.address, detector, a.imgsz, a.max_batch, a.max_wait_ms) as server:
+        print(f"[INFO] detector_server listening on {a.address} "
+              f"(backend {a.backend}/{a.precision}, max_batch {a.max_batch}, max_wait {a.max_wait_ms} ms)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# C:\summer\trafficlight-lite\tools\detlog.py
+"""
+원시 검출 기록 (.tldet): 필터 전 검출을 프레임 단위로 append → 나중에 모델 없이 필터/자막만 다시 실행
+- 파일: [MAGIC 8바이트][uint32 LE 헤더 길이][JSON 헤더 (W, H, fps, source, weights, conf ...)][레코드...]
+- 레코드: 고정 크기 34바이트 (frame int32, t_ms float64, xyxy float32x4, conf float32, cls int16)
+  프레임마다 sentinel 레코드(cls = -1) 1개 + 검출 N개 → 검출 0개 프레임도 timestamp 가 남음
+- 쓰기는 append 만 → 중간에 죽어도 마지막 불완전 레코드만 버리고 읽을 수 있음
+- 읽기는 np.memmap (필드별 column view, 복사 없음)
+
+    python video_trafficlight_system.py --source ..\\test.mp4 --conf 0.25 --record_dets test.tldet
+    python video_trafficlight_system.py --replay_dets test.tldet --conf 0.5 --min_area 200 --captions
+"""
+import json
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+import numpy as np
+
+MAGIC = b"TLDET\x00\x01\x00"
+ROW = np.dtype([
+    ("frame", "<i4"),
+    ("t_ms", "<f8"),
+    ("xyxy", "<f4", (4,)),
+    ("conf", "<f4"),
+    ("cls", "<i2"),
+])  # packed, 34 bytes
+
+Raw = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class DetLogWriter:
+    def __init__(self, path: str, meta: Dict[str, Any]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.f = open(self.path, "wb")
+        h = json.dumps(meta).encode("utf-8")
+        self.f.write(MAGIC + struct.pack("<I", len(h)) + h)
+        self.frames = 0
+
+    def write(self, frame_idx: int, t_ms: float, raw: Raw):
+        xyxy, confs, clss = raw
+        rows = np.zeros(len(confs) + 1, ROW)
+        rows["frame"] = frame_idx
+        rows["t_ms"] = t_ms
+        rows["cls"][0] = -1
+        rows["xyxy"][1:] = xyxy
+        rows["conf"][1:] = confs
+        rows["cls"][1:] = clss
+        self.f.write(rows.tobytes())
+        self.frames += 1
+
+    def close(self):
+        self.f.close()
+
+
+class DetLog:
+    """memory-map 된 .tldet. 프레임 순서대로 (frame_idx, t_ms, raw) 반복"""
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a detection log: {path}")
+            (n,) = struct.unpack("<I", f.read(4))
+            self.meta: Dict[str, Any] = json.loads(f.read(n).decode("utf-8"))
+        offset = len(MAGIC) + 4 + n
+        count = (Path(path).stat().st_size - offset) // ROW.itemsize
+        # ndarray view: 데이터는 그대로 memmap, 프레임별 slicing 때 np.memmap 서브클래스 오버헤드만 제거
+        self.rows = (np.memmap(path, ROW, mode="r", offset=offset, shape=(count,)).view(np.ndarray)
+                     if count else np.zeros(0, ROW))
+        cls = self.rows["cls"]
+        self.starts = np.flatnonzero(cls < 0)
+        self.ends = np.append(self.starts[1:], len(self.rows))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self) -> Iterator[Tuple[int, float, Raw]]:
+        frame, t_ms = self.rows["frame"], self.rows["t_ms"]
+        xyxy, conf, cls = self.rows["xyxy"], self.rows["conf"], self.rows["cls"]
+        for s, e in zip(self.starts.tolist(), self.ends.tolist()):
+            yield (int(frame[s]), float(t_ms[s]),
+                   (xyxy[s + 1:e], conf[s + 1:e], cls[s + 1:e].astype(int)))
@@ -0,0 +1,137 @@
+# C:\summer\trafficlight-lite\tools\ffmpeg_source.py
+"""
+ffmpeg subprocess 프레임 소스 (video_trafficlight_system.py --decoder ffmpeg)
+- 디코더 안에서 crop(ROI bounding rect, 옵션) + scale → 1080p/4K 를 풀해상도로 디코딩/복사하지 않음
+- stdout raw BGR 을 미리 할당한 버퍼 ring 에 readinto → np.frombuffer view (프레임마다 새 할당 없음)
+- FrameMapping 으로 디코딩 좌표 ↔ 원본 좌표 변환 (필터 / ROI / 이벤트는 원본 좌표 그대로)
+- cv2.VideoCapture 와 같은 read / get / set(POS_FRAMES, 0) / release / isOpened 인터페이스
+
+ffmpeg 실행 파일이 PATH 에 있어야 함 (또는 --ffmpeg 로 경로 지정)
+"""
+import subprocess
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class FrameMapping:
+    """원본 = 디코딩 * scale + offset  (crop 영역 (x0, y0, cw, ch) 을 (out_w, out_h) 로 scale)"""
+    def __init__(self, W0: int, H0: int, crop: Tuple[int, int, int, int], out_w: int, out_h: int):
+        self.W0, self.H0 = W0, H0
+        x0, y0, cw, ch = crop
+        self.scale = np.array([cw / out_w, ch / out_h, cw / out_w, ch / out_h], np.float32)
+        self.offset = np.array([x0, y0, x0, y0], np.float32)
+
+    def to_orig(self, raw: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        xyxy, confs, clss = raw
+        return xyxy * self.scale + self.offset, confs, clss
+
+    def xyxy_to_view(self, xyxy: np.ndarray) -> np.ndarray:
+        return np.round((xyxy - self.offset) / self.scale).astype(np.int32)
+
+    def poly_to_view(self, poly: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if poly is None:
+            return None
+        return np.round((poly - self.offset[:2]) / self.scale[:2]).astype(np.int32)
+
+
+def probe(source: str) -> Tuple[int, int, float]:
+    """원본 해상도 / fps (헤더만 읽음)"""
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Failed to open source: {source}")
+    W, H = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    return W, H, fps
+
+
+class FFmpegSource:
+    reuses_buffers = True  # read() 결과는 n_buffers 번 뒤에 덮어씀 → 계속 읽는 쪽 (--live grabber) 은 복사해야 함
+
+    def __init__(self, source: str, W0: int, H0: int, fps: float, width: int = 0,
+                 crop: Optional[Tuple[int, int, int, int]] = None, n_buffers: int = 8,
+                 ffmpeg: str = "ffmpeg"):
+        """
+        width: 디코딩 출력 폭 (0 = crop 영역 원본 폭), 높이는 비율 유지 (짝수)
+        crop : 원본 좌표 (x0, y0, x1, y1) → 이 영역만 디코딩 출력
+        n_buffers: 프레임 버퍼 개수. 동시에 살아 있는 프레임 수(큐/배치/저장 대기)보다 커야 함
+        """
+        self.source = source
+        self.fps = fps
+        self.ffmpeg = ffmpeg
+        x0, y0, x1, y1 = crop if crop is not None else (0, 0, W0, H0)
+        cw, ch = x1 - x0, y1 - y0
+        out_w = min(width, cw) if width > 0 else cw
+        out_w -= out_w % 2
+        out_h = max(2, int(round(ch * out_w / cw / 2)) * 2)
+        self.W, self.H = out_w, out_h
+        self.mapping = FrameMapping(W0, H0, (x0, y0, cw, ch), out_w, out_h)
+
+        vf = []
+        if (cw, ch) != (W0, H0):
+            vf.append(f"crop={cw}:{ch}:{x0}:{y0}")
+        if (out_w, out_h) != (cw, ch):
+            vf.append(f"scale={out_w}:{out_h}:flags=area")
+        self.cmd = [ffmpeg, "-v", "error", "-nostdin", "-i", source]
+        if vf:
+            self.cmd += ["-vf", ",".join(vf)]
+        self.cmd += ["-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+
+        self.frame_bytes = out_w * out_h * 3
+        self.buffers = [bytearray(self.frame_bytes) for _ in range(max(2, n_buffers))]
+        self.views = [memoryview(b) for b in self.buffers]
+        self.next_buf = 0
+        self.proc: Optional[subprocess.Popen] = None
+        self._start()
+
+    def _start(self):
+        self.proc = subprocess.Popen(self.cmd, stdout=subprocess.PIPE, bufsize=self.frame_bytes)
+
+    def isOpened(self) -> bool:
+        return self.proc is not None and (self.proc.poll() is None or self.proc.returncode == 0)
+
+    def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """image 가 있으면 그 배열(연속 메모리, H x W x 3 uint8)에 직접 읽음 (cv2 의 read(image) 와 같음)"""
+        if image is not None:
+            view = memoryview(image).cast("B")
+        else:
+            view = self.views[self.next_buf]
+        got = 0
+        while got < self.frame_bytes:
+            n = self.proc.stdout.readinto(view[got:])
+            if not n:
+                return False, None
+            got += n
+        if image is not None:
+            return True, image
+        i = self.next_buf
+        self.next_buf = (i + 1) % len(self.buffers)
+        return True, np.frombuffer(self.buffers[i], np.uint8).reshape(self.H, self.W, 3)
+
+    def get(self, prop: int) -> float:
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.W)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.H)
+        return 0.0
+
+    def set(self, prop: int, value: float) -> bool:
+        """POS_FRAMES=0 (되감기) 만 지원 → ffmpeg 재시작"""
+        if prop == cv2.CAP_PROP_POS_FRAMES and value == 0:
+            self.release()
+            self._start()
+            return True
+        return False
+
+    def release(self):
+        if self.proc is None:
+            return
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.stdout.close()
+        self.proc.wait()
+        self.proc = None
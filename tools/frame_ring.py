@@ -0,0 +1,71 @@
+# C:\summer\trafficlight-lite\tools\frame_ring.py
+"""
+multiprocessing.shared_memory 프레임 ring (video_trafficlight_system.py --procs)
+- 고정 크기 프레임 slot N 개 + slot 별 헤더 (seq, decode_ms) 를 shared memory 하나에
+- frame seq 는 항상 slot seq % N 에 씀 → 디코더 / 추론 워커 / 후처리 모두 seq 만으로 slot 을 찾음
+- 디코더는 free semaphore 로 빈 slot 을 기다림 (후처리가 seq 순서대로 반납 → seq - N 이 끝나야 seq 를 씀)
+- 헤더 seq 는 slot 을 쓴 프레임 번호 → 읽는 쪽이 소유권 확인 (엉뚱한 프레임을 읽으면 바로 에러)
+- 프레임은 slot 에 직접 디코딩 (cap.read(image=view)), 워커는 view 로 읽기만 → 프로세스 간 프레임 pickle/복사 없음
+"""
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+HEADER = np.dtype([("seq", "<i8"), ("decode_ms", "<f8")])
+
+
+class FrameRing:
+    def __init__(self, n_slots: int, shape: Tuple[int, int, int], name: Optional[str] = None):
+        """name=None 이면 새로 만들고 (소유자, 끝나면 unlink), 있으면 기존 ring 에 attach"""
+        self.n_slots = n_slots
+        self.shape = tuple(shape)
+        head_bytes = n_slots * HEADER.itemsize
+        frame_bytes = int(np.prod(shape))
+        size = head_bytes + n_slots * frame_bytes
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.header = np.ndarray((n_slots,), HEADER, buffer=self.shm.buf)
+        self.frames = np.ndarray((n_slots, *self.shape), np.uint8, buffer=self.shm.buf, offset=head_bytes)
+        if self.owner:
+            self.header["seq"] = -1
+
+    @property
+    def spec(self) -> Tuple[str, int, Tuple[int, int, int]]:
+        """다른 프로세스에서 attach 할 때 넘기는 값 (name, n_slots, shape)"""
+        return self.shm.name, self.n_slots, self.shape
+
+    @classmethod
+    def attach(cls, spec: Tuple[str, int, Tuple[int, int, int]]) -> "FrameRing":
+        name, n_slots, shape = spec
+        return cls(n_slots, shape, name=name)
+
+    def slot(self, seq: int) -> int:
+        return seq % self.n_slots
+
+    def view(self, seq: int) -> np.ndarray:
+        """seq 가 쓸 slot 의 프레임 view (디코더가 여기에 직접 디코딩)"""
+        return self.frames[seq % self.n_slots]
+
+    def publish(self, seq: int, decode_ms: float):
+        i = seq % self.n_slots
+        self.header["decode_ms"][i] = decode_ms
+        self.header["seq"][i] = seq
+
+    def frame(self, seq: int) -> np.ndarray:
+        """seq 프레임 view (복사 없음). slot 이 이미 다른 프레임으로 덮였으면 RuntimeError"""
+        i = seq % self.n_slots
+        owner = int(self.header["seq"][i])
+        if owner != seq:
+            raise RuntimeError(f"Frame ring slot {i} holds frame {owner}, expected {seq}")
+        return self.frames[i]
+
+    def decode_ms(self, seq: int) -> float:
+        return float(self.header["decode_ms"][seq % self.n_slots])
+
+    def close(self):
+        # numpy view 가 남아 있으면 shm.close() 가 BufferError → 먼저 끊음
+        self.header = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
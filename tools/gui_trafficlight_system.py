@@ -1,11 +1,90 @@
 # C:\summer\trafficlight-lite\tools\gui_trafficlight_system.py
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import subprocess, sys, json, os
+import subprocess, sys, json, os, threading, base64
 from pathlib import Path
 
 CONFIG_FILE = "gui_config.json"
 
+
+class DetectionWorker(threading.Thread):
+    """
+    GUI 안에서 도는 검출 루프 (subprocess 대신).
+    모델/영상은 한 번만 열고, update() 로 받은 파라미터(ROI, conf, min_area, min_conf_by_cls,
+    자막 임계값 등)는 다음 프레임부터 반영 → 디코딩/추론 재시작 없음. 영상 끝나면 처음부터 반복.
+    weights / backend / device / source 변경은 Stop → Run 필요.
+    그린 프레임은 take_frame() 으로 Tk 메인 스레드가 가져가서 표시 (cv2.imshow 는 메인 스레드에서만 가능).
+    """
+    def __init__(self, argv):
+        super().__init__(name="detection-worker", daemon=True)
+        self.argv = argv
+        self._pending = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._frame = None  # 가장 최근에 그린 프레임 (Tk 스레드가 가져감)
+        self.error = None
+
+    def update(self, argv):
+        with self._lock:
+            self._pending = argv
+
+    def stop(self):
+        self._stop_event.set()
+
+    def take_frame(self):
+        """아직 표시 안 한 최신 프레임 (없으면 None)"""
+        with self._lock:
+            vis, self._frame = self._frame, None
+        return vis
+
+    def run(self):
+        try:
+            self._loop()
+        except SystemExit:
+            # argparse 오류 (메시지는 콘솔에 출력됨) → 조용히 죽지 않고 poll_worker 가 표시
+            self.error = ValueError("invalid arguments (see console)")
+        except Exception as e:
+            self.error = e
+
+    def _loop(self):
+        import cv2
+        import video_trafficlight_system as vts
+
+        a = vts.parse_args(self.argv)
+        model = vts.load_model(a)
+        cap, W0, H0 = vts.open_video(a.source)
+        roi_poly = vts.build_roi_polygon(vts.parse_roi(a.roi), W0, H0)
+        post = vts.FramePostProcessor(a, roi_poly, fps=cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        detect = vts.build_detector(model, a, roi_poly, W0, H0)
+        try:
+            while not self._stop_event.is_set():
+                with self._lock:
+                    argv, self._pending = self._pending, None
+                if argv is not None:
+                    try:
+                        new_a = vts.parse_args(argv)
+                        roi_poly = vts.build_roi_polygon(vts.parse_roi(new_a.roi), W0, H0)
+                        # detector 부터 (실패하면 post / detect 모두 이전 설정 그대로)
+                        new_detect = vts.build_detector(model, new_a, roi_poly, W0, H0)
+                        post.update_args(new_a, roi_poly)
+                        detect, a = new_detect, new_a
+                    except ValueError as e:
+                        print("[WARN] parameter update ignored:", e)  # 잘못된 값 → 이전 설정 유지
+                    except SystemExit:
+                        print("[WARN] parameter update ignored: invalid arguments")  # argparse 오류
+
+                ok, frame = cap.read()
+                if not ok:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                vis = post.process(frame, detect([frame])[0])
+                if vis is not None:  # --show 일 때만 그림
+                    with self._lock:
+                        self._frame = vis
+        finally:
+            cap.release()
+
+
 class TrafficLightGUI(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -30,6 +109,7 @@ class TrafficLightGUI(tk.Tk):
         self.var_draw_roi = tk.BooleanVar(value=self.config_data.get("draw_roi", True))
         self.var_captions = tk.BooleanVar(value=self.config_data.get("captions", True))
         self.var_show     = tk.BooleanVar(value=self.config_data.get("show",     True))
+        self.var_live     = tk.BooleanVar(value=self.config_data.get("live",     True))
 
         # ------- Advanced -------
         self.var_min_area         = tk.IntVar(value=int(self.config_data.get("min_area", 120)))
@@ -43,8 +123,19 @@ class TrafficLightGUI(tk.Tk):
         self.var_cap_min_conf   = tk.DoubleVar(value=float(self.config_data.get("caption_min_conf", 0.50)))
 
         self.proc = None
+        self.worker = None
+        self._push_job = None
+        self.view = None      # in-process worker 결과 창 (Toplevel)
+        self.view_img = None  # 표시 중인 PhotoImage (참조를 잡아 둬야 Tk 가 지우지 않음)
         self.create_widgets()
 
+        # 값이 바뀌면 실행 중인 in-process worker 에 바로 반영
+        for var in (self.var_conf, self.var_imgsz, self.var_top_w, self.var_bottom_w, self.var_height,
+                    self.var_bottom_x, self.var_draw_roi, self.var_captions, self.var_min_area,
+                    self.var_debounce, self.var_iou, self.var_min_conf_by_cls, self.var_cap_min_frames,
+                    self.var_cap_min_tracks, self.var_cap_min_conf):
+            var.trace_add("write", lambda *_: self.schedule_push())
+
     # ---------- UI ----------
     def create_widgets(self):
         # Settings
@@ -94,6 +185,8 @@ class TrafficLightGUI(tk.Tk):
                         command=self.save_config).grid(row=0, column=1, sticky="w")
         ttk.Checkbutton(flag_frm, text="show window", variable=self.var_show,
                         command=self.save_config).grid(row=0, column=2, sticky="w")
+        ttk.Checkbutton(flag_frm, text="live tuning (in-process)", variable=self.var_live,
+                        command=self.save_config).grid(row=0, column=3, sticky="w")
 
         # Advanced
         adv_frm = ttk.LabelFrame(self, text="Advanced Settings")
@@ -166,6 +259,7 @@ class TrafficLightGUI(tk.Tk):
             "draw_roi":  self.var_draw_roi.get(),
             "captions":  self.var_captions.get(),
             "show":      self.var_show.get(),
+            "live":      self.var_live.get(),
             "min_area":        self.var_min_area.get(),
             "debounce_ms":     self.var_debounce.get(),
             "iou":             self.var_iou.get(),
@@ -181,19 +275,8 @@ class TrafficLightGUI(tk.Tk):
             print("Config save error:", e)
 
     # ---------- Run / Stop ----------
-    def run(self):
-        # 항상 최신 설정 저장
-        self.save_config()
-
-        weights = Path(self.var_weights.get())
-        source  = Path(self.var_source.get())
-        if not weights.exists():
-            messagebox.showerror("Error", f"Weights not found: {weights}")
-            return
-        if not source.exists():
-            messagebox.showerror("Error", f"Source not found: {source}")
-            return
-
+    def build_argv(self):
+        """현재 설정 → video_trafficlight_system.py 인자 (subprocess / in-process worker 공용)"""
         # trapezoid → polygon (normalized)
         top_w = self.var_top_w.get()
         bottom_w = self.var_bottom_w.get()
@@ -209,11 +292,9 @@ class TrafficLightGUI(tk.Tk):
         roi_vals = [x3, 0.0, x4, 0.0, x2, h, x1, h]
         roi_str = ",".join([f"{v:.3f}" for v in roi_vals])
 
-        script_path = Path(__file__).parent / "video_trafficlight_system.py"
-        cmd = [
-            sys.executable, str(script_path),
-            "--weights", str(weights),
-            "--source",  str(source),
+        argv = [
+            "--weights", self.var_weights.get(),
+            "--source",  self.var_source.get(),
             "--device",  self.var_device.get(),
             "--imgsz",   str(self.var_imgsz.get()),
             "--conf",    str(self.var_conf.get()),
@@ -224,20 +305,105 @@ class TrafficLightGUI(tk.Tk):
             "--min_conf_by_cls", self.var_min_conf_by_cls.get(),
             "--roi", roi_str,
         ]
-        if self.var_draw_roi.get(): cmd.append("--draw_roi")
-        if self.var_captions.get(): cmd.append("--captions")
-        if self.var_show.get():     cmd.append("--show")
+        if self.var_draw_roi.get(): argv.append("--draw_roi")
+        if self.var_captions.get(): argv.append("--captions")
+        if self.var_show.get():     argv.append("--show")
 
         # captions stabilization 인자 전달
-        cmd += [
+        argv += [
             "--caption_min_frames", str(self.var_cap_min_frames.get()),
             "--caption_min_tracks", str(self.var_cap_min_tracks.get()),
             "--caption_min_conf",   str(self.var_cap_min_conf.get()),
         ]
+        return argv
+
+    def schedule_push(self):
+        """슬라이더 드래그 등 연속 변경은 150ms 로 묶어서 한 번만 반영"""
+        if self._push_job is not None:
+            self.after_cancel(self._push_job)
+        self._push_job = self.after(150, self.push_params)
 
+    def push_params(self):
+        self._push_job = None
+        if self.worker is None or not self.worker.is_alive():
+            return
+        try:
+            argv = self.build_argv()
+        except tk.TclError:
+            return  # 입력 중인 값 (예: "0.") → 완성되면 다시 반영
+        self.worker.update(argv)
+        self.save_config()
+
+    def run(self):
+        # 항상 최신 설정 저장
+        self.save_config()
+
+        weights = Path(self.var_weights.get())
+        source  = Path(self.var_source.get())
+        if not weights.exists():
+            messagebox.showerror("Error", f"Weights not found: {weights}")
+            return
+        if not source.exists():
+            messagebox.showerror("Error", f"Source not found: {source}")
+            return
+
+        if self.var_live.get():
+            if self.worker is not None and self.worker.is_alive():
+                self.push_params()
+                return
+            self.worker = DetectionWorker(self.build_argv())
+            self.worker.start()
+            self.after(500, self.poll_worker)
+            self.after(15, self.show_frames)
+            return
+
+        script_path = Path(__file__).parent / "video_trafficlight_system.py"
+        cmd = [sys.executable, str(script_path)] + self.build_argv()
         self.proc = subprocess.Popen(cmd)
 
+    def poll_worker(self):
+        if self.worker is None:
+            return
+        if self.worker.is_alive():
+            self.after(500, self.poll_worker)
+        elif self.worker.error is not None:
+            messagebox.showerror("Error", f"Detection worker stopped: {self.worker.error}")
+            self.worker = None
+            self.close_view()
+
+    def show_frames(self):
+        """worker 가 그린 최신 프레임을 Tk 창에 표시 (Tk 메인 스레드에서, PNG → PhotoImage)"""
+        worker = self.worker
+        if worker is None or not worker.is_alive():
+            return
+        vis = worker.take_frame()
+        if vis is not None:
+            import cv2
+            if self.view is None:
+                self.view = tk.Toplevel(self)
+                self.view.title("traffic-light")
+                self.view.protocol("WM_DELETE_WINDOW", self.stop)
+                self.view.bind("<Escape>", lambda e: self.stop())
+                self.view_label = ttk.Label(self.view)
+                self.view_label.pack()
+            ok, png = cv2.imencode(".png", vis, [cv2.IMWRITE_PNG_COMPRESSION, 0])
+            if ok:
+                self.view_img = tk.PhotoImage(data=base64.b64encode(png.tobytes()))
+                self.view_label.configure(image=self.view_img)
+        self.after(15, self.show_frames)
+
+    def close_view(self):
+        if self.view is not None:
+            self.view.destroy()
+            self.view = None
+            self.view_img = None
+
     def stop(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker.join()  # 이전 worker 가 끝난 뒤에야 새 Run (모델 중복 로딩 방지)
+            self.worker = None
+        self.close_view()
         if self.proc and self.proc.poll() is None:
             try:
                 self.proc.kill()
@@ -0,0 +1,172 @@
+# C:\summer\trafficlight-lite\tools\metrics.py
+"""
+장시간 실행용 live metrics (video_trafficlight_system.py --metrics_port / --metrics_file)
+- HTTP  : http://127.0.0.1:<port>/metrics  (Prometheus text format)
+- 파일  : <metrics_file> 를 주기적으로 덮어씀 (JSON, tmp 파일 → rename 이라 읽는 쪽은 항상 완전한 파일)
+- 값    : 처리 프레임 수, 현재/rolling FPS, stage 별 latency 히스토그램, 큐 길이, drop 된 프레임,
+          GROUP 별 검출 수, 자막 변경 횟수
+값은 FramePostProcessor / Profiler 가 원래 갖고 있는 카운터를 읽기만 함 (처리 루프에 추가 비용 없음)
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Prometheus histogram 버킷 경계 (ms). Profiler 의 log2 버킷을 이 경계로 합침 (버킷 폭 ~9% 이내 근사)
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class LiveMetrics:
+    """post (FramePostProcessor) 의 카운터 → snapshot (dict) / Prometheus text"""
+    def __init__(self, post, groups: List[str], window_s: float = 10.0, sample_s: float = 1.0):
+        self.post = post
+        self.groups = groups
+        self.window_s = window_s
+        self.sample_s = sample_s
+        self.t_start = time.time()
+        self._samples: deque = deque()  # (t, frames) → rolling FPS
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._file: Optional[Path] = None
+        self._file_every = 0.0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread = threading.Thread(target=self._loop, name="metrics", daemon=True)
+
+    # ---------- collection ----------
+    def frames(self) -> int:
+        return self.post.processed
+
+    def rolling_fps(self) -> float:
+        with self._lock:
+            if len(self._samples) < 2:
+                return 0.0
+            (t0, f0), (t1, f1) = self._samples[0], self._samples[-1]
+        return (f1 - f0) / max(1e-6, t1 - t0)
+
+    def queue_depths(self) -> Dict[str, int]:
+        depths = {name: q.qsize() for name, q in self.post.queues.items()}
+        if self.post.saver is not None:
+            depths["video_writer"] = self.post.saver.q.qsize()
+        return depths
+
+    def dropped(self) -> Dict[str, int]:
+        drops = dict(self.post.dropped)
+        if self.post.saver is not None:
+            drops["video_writer"] = self.post.saver.dropped
+        return drops
+
+    def snapshot(self) -> dict:
+        prof = self.post.prof
+        ema = prof.ema["frame"]
+        return {
+            "time": time.time(),
+            "uptime_s": time.time() - self.t_start,
+            "frames": self.frames(),
+            "fps_current": 1000.0 / ema if ema > 0 else 0.0,
+            "fps_rolling": self.rolling_fps(),
+            "fps_window_s": self.window_s,
+            "latency_ms": {k: h.summary() for k, h in prof.hist.items() if h.count},
+            "queue_depth": self.queue_depths(),
+            "dropped_frames": self.dropped(),
+            "detections": dict(zip(self.groups, self.post.group_counts.tolist())),
+            "caption_changes": self.post.caption_changes,
+            "stable_caption": self.post.stabilizer.stable_caption,
+        }
+
+    def prometheus(self) -> str:
+        s = self.snapshot()
+        out = [
+            "# HELP tl_frames_total Frames processed",
+            "# TYPE tl_frames_total counter",
+            f"tl_frames_total {s['frames']}",
+            "# HELP tl_fps Processing FPS (current = EMA of frame interval, rolling = last window)",
+            "# TYPE tl_fps gauge",
+            f'tl_fps{{window="current"}} {s["fps_current"]:.3f}',
+            f'tl_fps{{window="{self.window_s:g}s"}} {s["fps_rolling"]:.3f}',
+            "# HELP tl_stage_latency_ms Per-frame stage latency",
+            "# TYPE tl_stage_latency_ms histogram",
+        ]
+        for stage, h in self.post.prof.hist.items():
+            if not h.count:
+                continue
+            cum, i = 0, 0
+            for le in BUCKETS_MS:
+                while i < len(h.counts) and h.upper_ms(i) <= le:
+                    cum += h.counts[i]
+                    i += 1
+                out.append(f'tl_stage_latency_ms_bucket{{stage="{stage}",le="{le}"}} {cum}')
+            out.append(f'tl_stage_latency_ms_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+            out.append(f'tl_stage_latency_ms_sum{{stage="{stage}"}} {h.total_ms:.3f}')
+            out.append(f'tl_stage_latency_ms_count{{stage="{stage}"}} {h.count}')
+        out += ["# HELP tl_queue_depth Items waiting in a queue", "# TYPE tl_queue_depth gauge"]
+        out += [f'tl_queue_depth{{queue="{k}"}} {v}' for k, v in s["queue_depth"].items()]
+        out += ["# HELP tl_dropped_frames_total Frames dropped", "# TYPE tl_dropped_frames_total counter"]
+        out += [f'tl_dropped_frames_total{{reason="{k}"}} {v}' for k, v in s["dropped_frames"].items()]
+        out += ["# HELP tl_detections_total Filtered detections per group", "# TYPE tl_detections_total counter"]
+        out += [f'tl_detections_total{{group="{k}"}} {v}' for k, v in s["detections"].items()]
+        out += ["# HELP tl_caption_changes_total Stable caption changes", "# TYPE tl_caption_changes_total counter",
+                f"tl_caption_changes_total {s['caption_changes']}"]
+        return "\n".join(out) + "\n"
+
+    # ---------- outputs ----------
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):  # 요청마다 stderr 출력 안 함
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"[METRICS] http://{host}:{port}/metrics")
+
+    def write_file(self, path: str, every_s: float):
+        self._file = Path(path)
+        self._file.parent.mkdir(parents=True, exist_ok=True)
+        self._file_every = every_s
+
+    def _dump(self):
+        tmp = self._file.with_suffix(self._file.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self._file)
+
+    def start(self):
+        self._thread.start()
+
+    def _loop(self):
+        last_dump = 0.0
+        while not self._stop.wait(self.sample_s):
+            now = time.time()
+            with self._lock:
+                self._samples.append((now, self.frames()))
+                while self._samples and now - self._samples[0][0] > self.window_s:
+                    self._samples.popleft()
+            if self._file is not None and now - last_dump >= self._file_every:
+                self._dump()
+                last_dump = now
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        if self._file is not None:
+            self._dump()  # 마지막 값
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,211 @@
+# C:\summer\trafficlight-lite\tools\multi_stream_system.py
+import argparse
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import video_trafficlight_system as vts
+from detector_backends import BACKENDS, make_backend
+
+# 모델 하나를 공유하므로 스트림별로 바꿀 수 없는 옵션
+SHARED_KEYS = {"weights", "backend", "device", "imgsz", "iou", "batch", "show", "queue_size"}
+# 스트림별로 적용되는 옵션 (필터 / ROI / 자막 / 이벤트). 나머지 (detect_every, gate_thresh, save_video,
+# record_dets, decoder, target_fps, pipeline, live ...) 는 공유 추론 루프에 없음 → 경고 후 무시
+STREAM_KEYS = {"source", "conf", "debounce_ms", "clock", "min_area", "min_conf_by_cls", "roi", "draw_roi",
+               "roi_crop", "roi_mask", "captions", "caption_min_tracks", "caption_min_conf", "caption_min_frames",
+               "events", "events_dets", "hud"}
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Multi-stream traffic-light system (one shared model)")
+    p.add_argument("--streams", type=str, required=True,
+                   help="JSON file: list of {name, source, <video_trafficlight_system options>}")
+    p.add_argument("--weights", type=str, default="C:/summer/trafficlight-lite/best.pt")
+    p.add_argument("--backend", type=str, default="torch", choices=BACKENDS)
+    p.add_argument("--device", type=str, default="0")
+    p.add_argument("--imgsz", type=int, default=640)
+    p.add_argument("--iou", type=float, default=0.7)
+    p.add_argument("--batch", type=int, default=8, help="Max frames per shared inference batch")
+    p.add_argument("--queue_size", type=int, default=4, help="Decoded-frame queue size per stream")
+    p.add_argument("--show", action="store_true", help="One window per stream")
+    return p.parse_args()
+
+
+def stream_argv(cfg: dict) -> list[str]:
+    """스트림 설정 dict → video_trafficlight_system CLI 인자. 적용 안 되는 키는 경고 후 제외"""
+    name = cfg.get("name", "?")
+    shared = sorted(k for k in cfg if k in SHARED_KEYS)
+    if shared:
+        print(f"[WARN] [{name}] per-stream {', '.join(shared)} ignored → shared command-line value is used")
+    options = vars(vts.parse_args([]))  # 오타 등 없는 옵션은 그대로 넘겨서 argparse 가 에러
+    unsupported = sorted(k for k in cfg
+                         if k in options and k != "name" and k not in SHARED_KEYS and k not in STREAM_KEYS)
+    if unsupported:
+        print(f"[WARN] [{name}] {', '.join(unsupported)} not supported in multi-stream mode → ignored")
+    argv = []
+    for k, v in cfg.items():
+        if k == "name" or k in SHARED_KEYS or k in unsupported:
+            continue
+        if isinstance(v, bool):
+            if v:
+                argv.append(f"--{k}")
+        else:
+            argv += [f"--{k}", str(v)]
+    return argv
+
+
+class Stream:
+    """소스 하나: decoder 스레드 + 자체 ROI / 필터 / 자막 안정화 상태"""
+    def __init__(self, name: str, a, queue_size: int):
+        self.name = name
+        self.a = a
+        if not Path(a.source).exists():
+            raise FileNotFoundError(f"[{name}] Source not found: {a.source}")
+        self.cap, W0, H0 = vts.open_video(a.source)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        roi_poly = vts.build_roi_polygon(vts.parse_roi(a.roi), W0, H0)
+        self.cropper = None
+        if (a.roi_crop or a.roi_mask) and roi_poly is not None:
+            self.cropper = vts.RoiCropper(roi_poly, W0, H0, mask=a.roi_mask)
+        self.post = vts.FramePostProcessor(a, roi_poly, window=name, fps=self.fps)
+        if a.events:
+            self.post.events = vts.EventWriter(a.events, a.events_dets)
+        self.q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.frames = 0
+        self.done = False
+        self.last_caption: str | None = None
+        self.thread: vts.StageThread | None = None
+
+    def start(self, stop: threading.Event):
+        def decode():
+            try:
+                while not stop.is_set():
+                    ok, frame = self.cap.read()
+                    if not ok:
+                        break
+                    if not vts.q_put(self.q, frame, stop):
+                        break
+            finally:
+                vts.q_put(self.q, vts.END, stop)
+
+        self.thread = vts.StageThread(f"decode-{self.name}", decode)
+        self.thread.start()
+
+
+def schedule(streams: list[Stream], batch: int, offset: int) -> list[tuple[Stream, np.ndarray]]:
+    """라운드로빈으로 준비된 프레임을 batch 장까지 수집 (스트림 내 순서 유지)"""
+    items: list[tuple[Stream, np.ndarray]] = []
+    order = streams[offset:] + streams[:offset]
+    progressed = True
+    while progressed and len(items) < batch:
+        progressed = False
+        for s in order:
+            if s.done or len(items) >= batch:
+                continue
+            try:
+                frame = s.q.get_nowait()
+            except queue.Empty:
+                continue
+            if frame is vts.END:
+                s.done = True
+                continue
+            items.append((s, frame))
+            progressed = True
+    return items
+
+
+def infer_by_shape(model, imgs: list[np.ndarray], a) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """입력 shape 가 같은 프레임끼리만 한 배치로 추론
+    - shape 가 섞인 배치는 letterbox padding 이 달라짐 → 스트림 결과가 같이 묶인 다른 스트림에 따라 바뀌는 것 방지
+    """
+    groups: dict[tuple, list[int]] = {}
+    for i, img in enumerate(imgs):
+        groups.setdefault(img.shape, []).append(i)
+    raws: list = [None] * len(imgs)
+    for idx in groups.values():
+        for i, raw in zip(idx, vts.infer_batch(model, [imgs[i] for i in idx], a)):
+            raws[i] = raw
+    return raws
+
+
+def main():
+    a = parse_args()
+    a.batch = max(1, a.batch)
+
+    if not Path(a.weights).exists():
+        raise FileNotFoundError(f"Weights not found: {a.weights}")
+    with open(a.streams, "r", encoding="utf-8") as f:
+        cfgs = json.load(f)
+    if isinstance(cfgs, dict):
+        cfgs = cfgs.get("streams", [])
+    if not cfgs:
+        raise ValueError(f"No streams in {a.streams}")
+
+    streams = []
+    for i, cfg in enumerate(cfgs):
+        name = str(cfg.get("name", f"stream{i}"))
+        sa = vts.parse_args(stream_argv(cfg))
+        sa.weights, sa.device, sa.imgsz, sa.iou, sa.show = a.weights, a.device, a.imgsz, a.iou, a.show
+        streams.append(Stream(name, sa, a.queue_size))
+
+    # 모델 1개 공유. 추론은 가장 낮은 conf 로 → 스트림별 conf 는 DetectionFilter 가 다시 적용
+    model = make_backend(a.backend, a.weights, a.device, a.imgsz)
+    infer_args = argparse.Namespace(imgsz=a.imgsz, iou=a.iou, conf=min(s.a.conf for s in streams))
+
+    stop = threading.Event()
+    for s in streams:
+        s.start(stop)
+
+    t0 = time.time()
+    offset = 0
+    try:
+        while not all(s.done for s in streams):
+            items = schedule(streams, a.batch, offset)
+            offset = (offset + 1) % len(streams)
+            if not items:
+                time.sleep(0.002)
+                continue
+
+            imgs = [s.cropper.crop(f) if s.cropper else f for s, f in items]
+            raws = infer_by_shape(model, imgs, infer_args)
+
+            for (s, frame), raw in zip(items, raws):
+                if s.cropper:
+                    raw = s.cropper.restore(raw)
+                vis = s.post.process(frame, raw)
+                caption = s.post.stabilizer.stable_caption
+                if caption != s.last_caption:
+                    print(f"[{s.name}] frame {s.frames} ({s.frames / s.fps:.2f}s): {caption}")
+                    s.last_caption = caption
+                s.frames += 1
+                if a.show:
+                    cv2.imshow(s.name, vis)
+
+            if a.show and cv2.waitKey(1) & 0xFF == 27:  # ESC
+                break
+    finally:
+        stop.set()
+        for s in streams:
+            s.thread.join()
+            s.cap.release()
+            vts.close_outputs(s.post)
+        cv2.destroyAllWindows()
+
+    for s in streams:
+        if s.thread.error is not None:
+            raise s.thread.error
+
+    dt = max(1e-6, time.time() - t0)
+    total = sum(s.frames for s in streams)
+    for s in streams:
+        print(f"[{s.name}] {s.frames} frames")
+    print(f"[INFO] {len(streams)} streams, {total} frames in {dt:.1f}s ({total / dt:.1f} fps total)")
+
+
+if __name__ == "__main__":
+    main()
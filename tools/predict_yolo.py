@@ -1,6 +1,8 @@
 import argparse
 from pathlib import Path
-from ultralytics import YOLO
+import cv2
+
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
 
 def parse_args():
     p = argparse.ArgumentParser("YOLOv8 inference")
@@ -10,10 +12,38 @@ def parse_args():
     p.add_argument("--conf",    type=float, default=0.25)
     p.add_argument("--device",  default="0", help='"0" GPU / "cpu" CPU')
     p.add_argument("--name",    default="predict_gpu")
+    p.add_argument("--server",  default="", help="host:port of a running detector_server.py (이미지 폴더/파일만)")
     return p.parse_args()
 
+def predict_via_server(a, save_dir: Path):
+    """상주 detector_server 로 추론 (모델 로딩 없음) → draw_boxes 로 저장"""
+    from detector_server import DetectorClient
+    from draw import draw_boxes
+
+    src = Path(a.source)
+    imgs = [src] if src.is_file() else sorted(p for p in src.rglob("*") if p.suffix.lower() in IMG_EXTS)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    client = DetectorClient(a.server)
+    n_det = 0
+    for i in range(0, len(imgs), 16):
+        chunk = imgs[i:i + 16]
+        results = client.predict_batch([str(p.resolve()) for p in chunk], imgsz=a.imgsz, conf=a.conf)
+        for p, dets in zip(chunk, results):
+            im = cv2.imread(str(p), cv2.IMREAD_COLOR)
+            cv2.imwrite(str(save_dir / p.name), draw_boxes(im, dets))
+            n_det += len(dets)
+    client.close()
+    print(f"[INFO] {len(imgs)} images, {n_det} detections (server {a.server})")
+
 def main():
     a = parse_args()
+    save_dir = Path(r"C:\summer\trafficlight-lite\runs\detect") / a.name
+    if a.server:
+        predict_via_server(a, save_dir)
+        print(f"[INFO] Predictions saved to: {save_dir}")
+        return
+
+    from ultralytics import YOLO
     model = YOLO(a.weights)
     out = model.predict(
         source=a.source,
@@ -26,7 +56,6 @@ def main():
         show=False,
         vid_stride=1
     )
-    save_dir = Path(r"C:\summer\trafficlight-lite\runs\detect") / a.name
     print(f"[INFO] Predictions saved to: {save_dir}")
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+# C:\summer\trafficlight-lite\tools\quantize_int8.py
+"""
+best.pt → INT8 (static calibration, ETRI train 이미지 샘플) + FP32 대비 리포트
+- onnx    : onnxruntime.quantization.quantize_static (QDQ, per-channel)  → best_int8.onnx
+- openvino: nncf.quantize                                               → best_int8_openvino_model/
+- 리포트  : 클래스별 mAP50-95 (ultralytics val) + 프레임당 latency, FP32 vs INT8
+- 가드    : --guard_classes 의 mAP 하락이 --max_drop 초과면 REJECT (exit 2)
+
+사용:
+    python quantize_int8.py --weights ..\\best.pt --data ..\\data.yaml --backend onnx --device cpu
+    python video_trafficlight_system.py --backend onnx --precision int8 ...
+"""
+import argparse
+import json
+import random
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from detector_backends import IMG_EXTS, export_model, exported_path, letterbox, make_backend, to_blob
+
+
+def parse_args():
+    p = argparse.ArgumentParser("INT8 quantization with accuracy guard")
+    p.add_argument("--weights", type=str, default=r"C:\summer\trafficlight-lite\best.pt")
+    p.add_argument("--data", type=str, default=r"C:\summer\trafficlight-lite\data.yaml")
+    p.add_argument("--backend", type=str, default="onnx", choices=["onnx", "openvino"])
+    p.add_argument("--device", type=str, default="cpu")
+    p.add_argument("--imgsz", type=int, default=640)
+    p.add_argument("--calib_images", type=int, default=300, help="Train images sampled for calibration")
+    p.add_argument("--latency_images", type=int, default=100, help="Val images used for latency timing")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--guard_classes", type=str, default="yellow,yellow_left",
+                   help="Comma separated class names whose mAP drop is checked")
+    p.add_argument("--max_drop", type=float, default=0.02, help="Max allowed mAP50-95 drop for guard classes")
+    p.add_argument("--max_drop_all", type=float, default=0.03, help="Max allowed overall mAP50-95 drop")
+    p.add_argument("--skip_quant", action="store_true", help="Reuse existing INT8 model, only run the report")
+    return p.parse_args()
+
+
+def load_data(data_yaml: str) -> dict:
+    with open(data_yaml, "r", encoding="utf-8") as f:
+        d = yaml.safe_load(f)
+    root = Path(d.get("path") or Path(data_yaml).parent)
+    for k in ("train", "val"):
+        if k in d and not Path(d[k]).is_absolute():
+            d[k] = str(root / d[k])
+    names = d["names"]
+    d["names"] = names if isinstance(names, list) else [names[i] for i in sorted(names)]
+    return d
+
+
+def sample_images(folder: str, n: int, seed: int) -> list[Path]:
+    imgs = sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in IMG_EXTS)
+    random.Random(seed).shuffle(imgs)
+    return imgs[:n]
+
+
+def calib_blobs(paths: list[Path], imgsz: int):
+    """추론 때와 같은 letterbox 전처리 → (1,3,imgsz,imgsz) float32"""
+    for p in paths:
+        im = cv2.imread(str(p), cv2.IMREAD_COLOR)
+        if im is not None:
+            yield to_blob([letterbox(im, imgsz)[0]])
+
+
+# =========================
+# Quantization
+# =========================
+def quantize_onnx(fp32: Path, out: Path, paths: list[Path], imgsz: int):
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat,
+                                          QuantType, quantize_static)
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.name = onnx.load(str(fp32), load_external_data=False).graph.input[0].name
+            self.it = calib_blobs(paths, imgsz)
+
+        def get_next(self):
+            blob = next(self.it, None)
+            return None if blob is None else {self.name: blob}
+
+    quantize_static(str(fp32), str(out), Reader(),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    calibrate_method=CalibrationMethod.MinMax)
+
+    # ultralytics val 이 클래스 이름/stride 를 읽도록 metadata 복사
+    src, dst = onnx.load(str(fp32)), onnx.load(str(out))
+    del dst.metadata_props[:]
+    dst.metadata_props.extend(src.metadata_props)
+    onnx.save(dst, str(out))
+
+
+def quantize_openvino(fp32_dir: Path, out_dir: Path, paths: list[Path], imgsz: int):
+    import nncf
+    import openvino as ov
+
+    core = ov.Core()
+    xml = next(fp32_dir.glob("*.xml"))
+    model = core.read_model(str(xml))
+    blobs = list(calib_blobs(paths, imgsz))
+    qmodel = nncf.quantize(model, nncf.Dataset(blobs), preset=nncf.QuantizationPreset.MIXED,
+                           subset_size=len(blobs))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ov.save_model(qmodel, str(out_dir / xml.name))
+    meta = fp32_dir / "metadata.yaml"
+    if meta.exists():
+        shutil.copy2(meta, out_dir / "metadata.yaml")
+
+
+# =========================
+# Report
+# =========================
+def per_class_map(model_path: Path, data_yaml: str, imgsz: int, device: str) -> tuple[float, list[float]]:
+    """ultralytics val → (전체 mAP50-95, 클래스별 mAP50-95)"""
+    from ultralytics import YOLO
+    m = YOLO(str(model_path), task="detect").val(data=data_yaml, imgsz=imgsz, batch=1,
+                                                  device=device, plots=False, verbose=False)
+    return float(m.box.map), [float(x) for x in m.box.maps]
+
+
+def latency_ms(backend, paths: list[Path], imgsz: int) -> dict:
+    imgs = [im for im in (cv2.imread(str(p), cv2.IMREAD_COLOR) for p in paths) if im is not None]
+    if not imgs:
+        return {}
+    backend.predict(imgs[:1], imgsz, 0.25, 0.7)  # warm-up
+    ts = []
+    for im in imgs:
+        t0 = time.perf_counter()
+        backend.predict([im], imgsz, 0.25, 0.7)
+        ts.append((time.perf_counter() - t0) * 1000.0)
+    return {"mean": float(np.mean(ts)), "p50": float(np.percentile(ts, 50)), "p95": float(np.percentile(ts, 95))}
+
+
+def main():
+    a = parse_args()
+    d = load_data(a.data)
+    names = d["names"]
+
+    fp32 = export_model(a.weights, a.backend, a.imgsz)
+    int8 = exported_path(a.weights, a.backend, "int8")
+
+    if not a.skip_quant:
+        calib = sample_images(d["train"], a.calib_images, a.seed)
+        if not calib:
+            print(f"[ERROR] No calibration images in {d['train']}")
+            sys.exit(1)
+        print(f"[INFO] Calibrating {a.backend} INT8 on {len(calib)} train images ...")
+        if a.backend == "onnx":
+            quantize_onnx(fp32, int8, calib, a.imgsz)
+        else:
+            quantize_openvino(fp32, int8, calib, a.imgsz)
+        print(f"[INFO] INT8 model: {int8}")
+    elif not int8.exists():
+        print(f"[ERROR] INT8 model not found: {int8}")
+        sys.exit(1)
+
+    # 정확도 (클래스별) + latency
+    map_fp32, maps_fp32 = per_class_map(fp32, a.data, a.imgsz, a.device)
+    map_int8, maps_int8 = per_class_map(int8, a.data, a.imgsz, a.device)
+    lat_paths = sample_images(d["val"], a.latency_images, a.seed)
+    lat_fp32 = latency_ms(make_backend(a.backend, a.weights, a.device, a.imgsz, "fp32"), lat_paths, a.imgsz)
+    lat_int8 = latency_ms(make_backend(a.backend, a.weights, a.device, a.imgsz, "int8"), lat_paths, a.imgsz)
+
+    guard = {g.strip() for g in a.guard_classes.split(",") if g.strip()}
+    rows, reasons = [], []
+    print(f"\n{'class':<20}{'fp32':>8}{'int8':>8}{'drop':>8}")
+    for i, n in enumerate(names):
+        f, q = maps_fp32[i], maps_int8[i]
+        rows.append({"class_id": i, "class_name": n, "map_fp32": f, "map_int8": q, "drop": f - q})
+        mark = " *" if n in guard else ""
+        print(f"{n:<20}{f:>8.3f}{q:>8.3f}{f - q:>8.3f}{mark}")
+        if n in guard and f - q > a.max_drop:
+            reasons.append(f"{n} mAP drop {f - q:.3f} > {a.max_drop}")
+    print(f"{'ALL':<20}{map_fp32:>8.3f}{map_int8:>8.3f}{map_fp32 - map_int8:>8.3f}")
+    if map_fp32 - map_int8 > a.max_drop_all:
+        reasons.append(f"overall mAP drop {map_fp32 - map_int8:.3f} > {a.max_drop_all}")
+    if lat_fp32 and lat_int8:
+        print(f"\nlatency/frame (ms)  fp32 mean {lat_fp32['mean']:.1f} p95 {lat_fp32['p95']:.1f} | "
+              f"int8 mean {lat_int8['mean']:.1f} p95 {lat_int8['p95']:.1f} "
+              f"(x{lat_fp32['mean'] / max(1e-6, lat_int8['mean']):.2f})")
+
+    report = {
+        "backend": a.backend, "imgsz": a.imgsz, "fp32_model": str(fp32), "int8_model": str(int8),
+        "map_fp32": map_fp32, "map_int8": map_int8, "classes": rows,
+        "latency_ms_fp32": lat_fp32, "latency_ms_int8": lat_int8,
+        "guard_classes": sorted(guard), "max_drop": a.max_drop, "max_drop_all": a.max_drop_all,
+        "accepted": not reasons, "reject_reasons": reasons,
+    }
+    report_path = int8.parent / f"{Path(a.weights).stem}_int8_{a.backend}_report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n[INFO] Report saved to: {report_path}")
+
+    if reasons:
+        for r in reasons:
+            print(f"[REJECT] {r}")
+        sys.exit(2)
+    print("[ACCEPT] INT8 model within accuracy budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+# C:\summer\trafficlight-lite\tools\sweep_thresholds.py
+"""
+필터 / 자막 임계값 sweep
+1) 영상마다 추론은 한 번만 (sweep 범위의 가장 낮은 conf) → 원시 검출을 .tldet 으로 캐시 (detlog.py)
+2) conf / min_area / min_conf_by_cls / caption_min_* / debounce_ms 조합(grid 또는 random)을
+   process pool 에서 캐시 재생으로 평가 (모델 없음, 디바운스는 영상 시간 frame/fps 기준)
+3) 정답 자막 타임라인과 비교 → accuracy / flicker / latency 순위표 (+ CSV)
+
+videos.json:
+    [{"source": "C:/videos/a.mp4", "labels": "C:/videos/a_captions.csv", "roi": "0.35,0,0.65,0,0.95,0.6,0.05,0.6"}]
+labels CSV (초 단위, caption 은 video_trafficlight_system 자막 문구 그대로, 빈 칸 = 자막 없음):
+    start,end,caption
+    0.0,3.2,
+    3.2,9.5,Red light / Stop
+    9.5,12.0,Green light / Go straight
+
+    python sweep_thresholds.py --videos videos.json --weights ..\\best.pt --device 0 --random 300
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import video_trafficlight_system as vts
+from detector_backends import BACKENDS
+from detlog import DetLog, DetLogWriter
+
+# sweep 대상 (video_trafficlight_system 옵션 이름). min_conf_by_cls 만 값 구분자가 ';'
+SPACE_KEYS = ["conf", "min_area", "min_conf_by_cls", "caption_min_frames",
+              "caption_min_tracks", "caption_min_conf", "debounce_ms"]
+SPACE_TYPES = {"conf": float, "min_area": int, "min_conf_by_cls": str, "caption_min_frames": int,
+               "caption_min_tracks": int, "caption_min_conf": float, "debounce_ms": int}
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Filter / caption threshold sweep on cached detections")
+    p.add_argument("--videos", type=str, required=True,
+                   help="JSON file: list of {source, labels, roi(optional), name(optional)}")
+    p.add_argument("--weights", type=str, default="C:/summer/trafficlight-lite/best.pt")
+    p.add_argument("--backend", type=str, default="torch", choices=BACKENDS)
+    p.add_argument("--device", type=str, default="0")
+    p.add_argument("--imgsz", type=int, default=640)
+    p.add_argument("--iou", type=float, default=0.7)
+    p.add_argument("--batch", type=int, default=8, help="Frames per model.predict call while caching")
+    p.add_argument("--cache_dir", type=str, default="sweep_cache", help="Where .tldet caches are kept")
+    # search space (comma separated; min_conf_by_cls 는 ';' 구분, 빈 값 = 없음)
+    p.add_argument("--conf", type=str, default="0.35,0.45,0.55")
+    p.add_argument("--min_area", type=str, default="60,120,200")
+    p.add_argument("--min_conf_by_cls", type=str, default=";5:0.40,6:0.40")
+    p.add_argument("--caption_min_frames", type=str, default="3,6,10")
+    p.add_argument("--caption_min_tracks", type=str, default="1,2")
+    p.add_argument("--caption_min_conf", type=str, default="0.4,0.5")
+    p.add_argument("--debounce_ms", type=str, default="0,400,800")
+    p.add_argument("--random", type=int, default=0, help="Evaluate N random configs from the grid (0 = full grid)")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--workers", type=int, default=0, help="Process pool size (0 = CPU count)")
+    p.add_argument("--top", type=int, default=20, help="Rows printed in the ranked table")
+    p.add_argument("--out", type=str, default="sweep_results.csv")
+    return p.parse_args()
+
+
+def build_space(a) -> list[dict]:
+    axes = []
+    for k in SPACE_KEYS:
+        s = getattr(a, k)
+        vals = s.split(";") if k == "min_conf_by_cls" else [v for v in s.split(",") if v.strip()]
+        axes.append([SPACE_TYPES[k](v.strip()) for v in vals])
+    grid = [dict(zip(SPACE_KEYS, combo)) for combo in itertools.product(*axes)]
+    if 0 < a.random < len(grid):
+        grid = random.Random(a.seed).sample(grid, a.random)
+    return grid
+
+
+def config_argv(cfg: dict) -> list[str]:
+    argv = []
+    for k, v in cfg.items():
+        argv += [f"--{k}", str(v)]
+    return argv
+
+
+def load_labels(path: str, n_frames: int, fps: float) -> list[str | None]:
+    """start,end,caption (초) → 프레임별 정답 자막 (구간 밖 = None)"""
+    t = np.arange(n_frames) / fps
+    out: list[str | None] = [None] * n_frames
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            caption = (row.get("caption") or "").strip() or None
+            idx = np.flatnonzero((t >= float(row["start"])) & (t < float(row["end"])))
+            for i in idx.tolist():
+                out[i] = caption
+    return out
+
+
+# =========================
+# 1) Detection cache
+# =========================
+def cache_path(a, source: str) -> Path:
+    return Path(a.cache_dir) / f"{Path(source).stem}_{Path(a.weights).stem}_{a.backend}_{a.imgsz}.tldet"
+
+
+def cache_ok(path: Path, a, conf: float) -> bool:
+    if not path.exists():
+        return False
+    meta = DetLog(str(path)).meta
+    return (meta.get("weights") == str(a.weights) and meta.get("imgsz") == a.imgsz and
+            meta.get("iou") == a.iou and float(meta.get("conf", 1.0)) <= conf)
+
+
+def record_detections(a, videos: list[dict], conf: float):
+    """캐시 없는 영상만 추론 (ROI 없이 전체 프레임, 가장 낮은 conf) → .tldet"""
+    todo = [v for v in videos if not cache_ok(v["log"], a, conf)]
+    if not todo:
+        return
+    ia = vts.parse_args(["--weights", a.weights, "--backend", a.backend, "--device", a.device,
+                         "--imgsz", str(a.imgsz), "--iou", str(a.iou), "--conf", str(conf),
+                         "--batch", str(max(1, a.batch))])
+    model = vts.load_model(ia)
+    for v in todo:
+        t0 = time.time()
+        cap, W, H = vts.open_video(v["source"])
+        post = vts.FramePostProcessor(ia, None)
+        detect = vts.build_detector(model, ia, None, W, H)
+        tmp = v["log"].with_suffix(".tmp")
+        post.recorder = DetLogWriter(str(tmp), {
+            "W": W, "H": H, "fps": cap.get(cv2.CAP_PROP_FPS) or 30.0, "source": v["source"],
+            "weights": str(a.weights), "backend": a.backend, "imgsz": a.imgsz, "conf": conf, "iou": a.iou,
+        })
+        try:
+            vts.run_serial(detect, cap, post, ia)
+        finally:
+            cap.release()
+            post.recorder.close()
+        tmp.replace(v["log"])  # 끝까지 기록된 것만 캐시로 인정
+        print(f"[CACHE] {v['name']}: {post.recorder.frames} frames in {time.time() - t0:.1f}s → {v['log']}")
+
+
+# =========================
+# 2) Evaluation (worker process)
+# =========================
+_VIDEOS: list[dict] = []
+
+
+def _init_worker(videos: list[dict]):
+    """워커마다 한 번: 캐시 memmap + 정답 타임라인 로드"""
+    global _VIDEOS
+    _VIDEOS = []
+    for v in videos:
+        log = DetLog(str(v["log"]))
+        fps = float(log.meta.get("fps") or 30.0)
+        frames = list(log)
+        _VIDEOS.append({
+            "roi": v.get("roi", ""), "W": int(log.meta["W"]), "H": int(log.meta["H"]), "fps": fps,
+            "frames": frames, "labels": load_labels(v["labels"], len(frames), fps),
+        })
+
+
+def score(out: list[str | None], labels: list[str | None], fps: float) -> dict:
+    """- correct : 정답과 같은 자막인 프레임 수
+    - flicker : 틀린 자막으로 바뀐 횟수
+    - latency : 정답 구간 시작 → 처음 정답 자막이 나올 때까지 (ms), 구간 안에 못 나오면 missed
+    """
+    correct = sum(o == l for o, l in zip(out, labels))
+    flicker = sum(1 for i in range(1, len(out)) if out[i] != out[i - 1] and out[i] != labels[i])
+    latencies, missed = [], 0
+    start = 0
+    for i in range(1, len(labels) + 1):
+        if i < len(labels) and labels[i] == labels[start]:
+            continue
+        hit = next((j for j in range(start, i) if out[j] == labels[j]), None)
+        if hit is None:
+            missed += 1
+        else:
+            latencies.append((hit - start) * 1000.0 / fps)
+        start = i
+    return {"correct": correct, "flicker": flicker, "latencies": latencies, "missed": missed}
+
+
+def evaluate(cfg: dict) -> dict:
+    frames = correct = flicker = missed = 0
+    latencies: list[float] = []
+    for v in _VIDEOS:
+        a = vts.parse_args(config_argv(cfg) + ["--captions", "--roi", v["roi"]])
+        W, H, fps = v["W"], v["H"], v["fps"]
+        post = vts.FramePostProcessor(a, vts.build_roi_polygon(vts.parse_roi(a.roi), W, H), fps=fps)
+        out = []
+        for idx, _, raw in v["frames"]:
+            post.step(raw, W, H, idx * 1000.0 / fps)  # 영상 시간 기준 디바운스 (--clock video 와 동일)
+            out.append(post.stabilizer.stable_caption)
+        s = score(out, v["labels"], fps)
+        frames += len(out)
+        correct += s["correct"]
+        flicker += s["flicker"]
+        missed += s["missed"]
+        latencies += s["latencies"]
+    return dict(cfg,
+                accuracy=correct / max(1, frames),
+                flicker=flicker,
+                latency_ms=float(np.mean(latencies)) if latencies else float("nan"),
+                missed=missed)
+
+
+# =========================
+# Main
+# =========================
+def main():
+    a = parse_args()
+    with open(a.videos, "r", encoding="utf-8") as f:
+        videos = json.load(f)
+    if isinstance(videos, dict):
+        videos = videos.get("videos", [])
+    if not videos:
+        raise ValueError(f"No videos in {a.videos}")
+    for i, v in enumerate(videos):
+        for k in ("source", "labels"):
+            if not Path(v[k]).exists():
+                raise FileNotFoundError(f"{k} not found: {v[k]}")
+        v.setdefault("name", Path(v["source"]).stem or f"video{i}")
+        v["log"] = cache_path(a, v["source"])
+
+    configs = build_space(a)
+    conf_min = min(c["conf"] for c in configs)
+    Path(a.cache_dir).mkdir(parents=True, exist_ok=True)
+    record_detections(a, videos, conf_min)
+
+    print(f"[INFO] Evaluating {len(configs)} configs on {len(videos)} videos ...")
+    t0 = time.time()
+    n = a.workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=n, initializer=_init_worker, initargs=(videos,)) as ex:
+        results = list(ex.map(evaluate, configs, chunksize=max(1, len(configs) // (n * 4))))
+    dt = max(1e-6, time.time() - t0)
+    print(f"[INFO] {len(configs)} configs in {dt:.1f}s ({len(configs) / dt:.1f} configs/s, {n} workers)")
+
+    # accuracy ↑, flicker ↓, missed ↓, latency ↓
+    results.sort(key=lambda r: (-r["accuracy"], r["flicker"], r["missed"],
+                                r["latency_ms"] if r["latency_ms"] == r["latency_ms"] else float("inf")))
+
+    cols = ["accuracy", "flicker", "latency_ms", "missed"] + SPACE_KEYS
+    with open(a.out, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=["rank"] + cols)
+        w.writeheader()
+        for i, r in enumerate(results, 1):
+            w.writerow(dict(rank=i, **{k: r[k] for k in cols}))
+
+    print(f"\n{'#':>3} {'acc':>6} {'flick':>5} {'lat_ms':>7} {'miss':>4} | "
+          f"{'conf':>5} {'area':>5} {'frames':>6} {'tracks':>6} {'c_conf':>6} {'deb':>5}  min_conf_by_cls")
+    for i, r in enumerate(results[:a.top], 1):
+        print(f"{i:>3} {r['accuracy']:>6.3f} {r['flicker']:>5} {r['latency_ms']:>7.0f} {r['missed']:>4} | "
+              f"{r['conf']:>5.2f} {r['min_area']:>5} {r['caption_min_frames']:>6} {r['caption_min_tracks']:>6} "
+              f"{r['caption_min_conf']:>6.2f} {r['debounce_ms']:>5}  {r['min_conf_by_cls'] or '-'}")
+    print(f"\n[INFO] Full ranking saved to: {a.out}")
+
+
+if __name__ == "__main__":
+    main()
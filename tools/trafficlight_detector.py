@@ -1,21 +1,80 @@
 from pathlib import Path
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Iterable, Iterator, Optional
 import numpy as np
 import cv2
-from ultralytics import YOLO
+
+from detector_backends import make_backend
+
+class DetectionBatch:
+    """
+    여러 이미지의 검출 결과를 한 묶음 numpy 배열로 (이미지/박스별 dict 생성 없음)
+    boxes: (N,4) float32 [x1,y1,x2,y2], conf: (N,) float32, cls: (N,) int16,
+    img_idx: (N,) int32 (정렬됨), 이미지 범위: start ~ start+n_images-1
+    """
+    __slots__ = ("boxes", "conf", "cls", "img_idx", "start", "n_images", "classes_map")
+
+    def __init__(self, boxes, conf, cls, img_idx, start: int, n_images: int, classes_map: Dict[int, str]):
+        self.boxes = boxes
+        self.conf = conf
+        self.cls = cls
+        self.img_idx = img_idx
+        self.start = start
+        self.n_images = n_images
+        self.classes_map = classes_map
+
+    @classmethod
+    def from_raws(cls, raws, start: int, classes_map: Dict[int, str]) -> "DetectionBatch":
+        """백엔드 출력 (이미지별 (xyxy, conf, cls)) → 하나로 합침"""
+        counts = [len(r[1]) for r in raws]
+        if sum(counts) == 0:
+            return cls(np.zeros((0, 4), np.float32), np.zeros((0,), np.float32), np.zeros((0,), np.int16),
+                       np.zeros((0,), np.int32), start, len(raws), classes_map)
+        return cls(np.concatenate([r[0] for r in raws]).astype(np.float32, copy=False),
+                   np.concatenate([r[1] for r in raws]).astype(np.float32, copy=False),
+                   np.concatenate([r[2] for r in raws]).astype(np.int16),
+                   np.repeat(np.arange(start, start + len(raws), dtype=np.int32), counts),
+                   start, len(raws), classes_map)
+
+    def __len__(self):
+        return len(self.conf)
+
+    def for_image(self, i: int):
+        """이미지 i (전체 stream 기준 index) 의 (boxes, conf, cls) view"""
+        lo, hi = np.searchsorted(self.img_idx, [i, i + 1])
+        return self.boxes[lo:hi], self.conf[lo:hi], self.cls[lo:hi]
+
+    def to_dicts(self) -> List[List[Dict[str, Any]]]:
+        """예전 predict() 형식으로 변환 → 이미지별 리스트"""
+        out: List[List[Dict[str, Any]]] = [[] for _ in range(self.n_images)]
+        for b, c, k, i in zip(self.boxes.tolist(), self.conf.tolist(), self.cls.tolist(), self.img_idx.tolist()):
+            out[i - self.start].append({
+                "class_id": k,
+                "class_name": self.classes_map.get(k, f"class_{k}"),
+                "conf": c,
+                "bbox": b
+            })
+        return out
+
 
 class TrafficLightDetector:
     """
     입력: BGR np.ndarray(H,W,3) 또는 이미지 경로(str)
     출력: [{"class_id":int,"class_name":str,"conf":float,"bbox":[x1,y1,x2,y2]}]
+    backend: "torch"(기본, .pt 그대로) / "onnx" / "openvino" (.pt 면 첫 실행 시 자동 export)
+    precision: "fp32" / "int8" (quantize_int8.py 로 만든 모델, onnx/openvino 만)
+    여러 장: predict_batch(images) / predict_stream(iterable) → DetectionBatch (numpy 배열)
     """
     def __init__(self,
                  weights: Union[str, Path],
                  device: str = "0",
                  conf_thres: float = 0.25,
                  iou_thres: float = 0.7,
-                 classes_map: Dict[int, str] = None):
-        self.model = YOLO(str(weights))
+                 classes_map: Dict[int, str] = None,
+                 backend: str = "torch",
+                 imgsz: int = 512,
+                 precision: str = "fp32"):
+        self.backend = make_backend(backend, str(weights), device, imgsz, precision)
+        self.model = getattr(self.backend, "model", None)  # torch 백엔드일 때 YOLO 객체
         self.device = device
         self.conf = conf_thres
         self.iou = iou_thres
@@ -28,27 +87,27 @@ class TrafficLightDetector:
         return img
 
     def predict(self, img, imgsz: int = 512) -> List[Dict[str, Any]]:
-        img = self._to_bgr(img)
-        r = self.model.predict(
-            source=img,
-            device=self.device,
-            imgsz=imgsz,
-            conf=self.conf,
-            iou=self.iou,
-            verbose=False
-        )[0]
-
-        out = []
-        if r.boxes is None: 
-            return out
-        boxes = r.boxes.xyxy.cpu().numpy()
-        confs = r.boxes.conf.cpu().numpy()
-        cls   = r.boxes.cls.cpu().numpy().astype(int)
-        for (x1,y1,x2,y2), c, k in zip(boxes, confs, cls):
-            out.append({
-                "class_id": int(k),
-                "class_name": self.classes_map.get(int(k), f"class_{int(k)}"),
-                "conf": float(c),
-                "bbox": [float(x1), float(y1), float(x2), float(y2)]
-            })
-        return out
+        return self.predict_batch([img], imgsz=imgsz).to_dicts()[0]
+
+    def predict_batch(self, images: List[Any], imgsz: int = 512, batch_size: Optional[int] = None,
+                      start: int = 0) -> DetectionBatch:
+        """이미지 여러 장 → DetectionBatch 하나. batch_size 단위로 나눠서 모델 호출 (None=한 번에)"""
+        imgs = [self._to_bgr(im) for im in images]
+        step = batch_size or max(1, len(imgs))
+        raws = []
+        for i in range(0, len(imgs), step):
+            raws += self.backend.predict(imgs[i:i + step], imgsz=imgsz, conf=self.conf, iou=self.iou)
+        return DetectionBatch.from_raws(raws, start, self.classes_map)
+
+    def predict_stream(self, images: Iterable[Any], imgsz: int = 512, batch_size: int = 8) -> Iterator[DetectionBatch]:
+        """iterable(프레임/경로) 을 batch_size 씩 묶어 추론 → 묶음마다 DetectionBatch (img_idx 는 stream 기준)"""
+        buf: List[Any] = []
+        start = 0
+        for im in images:
+            buf.append(im)
+            if len(buf) >= batch_size:
+                yield self.predict_batch(buf, imgsz=imgsz, start=start)
+                start += len(buf)
+                buf = []
+        if buf:
+            yield self.predict_batch(buf, imgsz=imgsz, start=start)
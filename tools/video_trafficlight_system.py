@@ -1,11 +1,17 @@
 # C:\summer\trafficlight-lite\tools\video_trafficlight_system.py
 import argparse
+import json
+import math
+import os
+import queue
+import threading
 import time
 from pathlib import Path
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
+
+from detector_backends import BACKENDS, PRECISIONS, make_backend
 
 # =========================
 # Class / Group definitions (data.yaml 기준)
@@ -37,6 +43,13 @@ GROUPS = {
 }
 GROUP_PRIORITY = ["RED", "YELLOW", "GREEN", "WARN", "COUNTDOWN", "OFF"]
 
+NUM_CLASSES = len(ID_TO_NAME)
+# class id → GROUP_PRIORITY index (-1 = 그룹 없음). 인덱스가 작을수록 우선순위 높음
+CLS_TO_GROUP = np.full(NUM_CLASSES, -1, np.int8)
+for _gi, _g in enumerate(GROUP_PRIORITY):
+    for _k in GROUPS[_g]:
+        CLS_TO_GROUP[_k] = _gi
+
 
 # =========================
 # Caption (EN)
@@ -66,7 +79,7 @@ def caption_text(group_name: str, top_cls: int) -> str | None:
 # =========================
 # Utils
 # =========================
-def parse_args():
+def parse_args(argv: list[str] | None = None):
     p = argparse.ArgumentParser("Traffic-light system with trapezoid ROI and captions")
     # Basics
     p.add_argument("--weights", type=str, default="C:/summer/trafficlight-lite/best.pt")
@@ -76,21 +89,96 @@ def parse_args():
     p.add_argument("--conf", type=float, default=0.55)
     p.add_argument("--iou", type=float, default=0.7)
     p.add_argument("--name", type=str, default="exp")
+    p.add_argument("--backend", type=str, default="torch", choices=BACKENDS,
+                   help="torch=ultralytics .pt, onnx/openvino=exported from --weights (auto export on first run)")
+    p.add_argument("--precision", type=str, default="fp32", choices=PRECISIONS,
+                   help="int8 = quantized model from quantize_int8.py (onnx/openvino only)")
+    p.add_argument("--server", type=str, default="",
+                   help="host:port of a running detector_server.py (weights/backend/device are then ignored)")
     # Filters
     p.add_argument("--debounce_ms", type=int, default=800)
+    p.add_argument("--clock", type=str, default="wall", choices=["wall", "video"],
+                   help="Time base for debounce: wall=real time, video=frame index / fps (same result at any speed)")
     p.add_argument("--min_area", type=int, default=120)
     p.add_argument("--min_conf_by_cls", type=str, default="")
     # ROI: normalized. 8 numbers = polygon (x1,y1,...,x4,y4), 4 numbers = rect (nx,ny,nw,nh)
     p.add_argument("--roi", type=str, default="")
     p.add_argument("--draw_roi", action="store_true")
+    p.add_argument("--roi_crop", action="store_true", help="Run inference on the ROI bounding rect only")
+    p.add_argument("--roi_mask", action="store_true", help="--roi_crop + blank pixels outside the ROI polygon")
     # Captions thresholds
     p.add_argument("--captions", action="store_true")
     p.add_argument("--caption_min_tracks", type=int, default=1)
     p.add_argument("--caption_min_conf", type=float, default=0.50)
     p.add_argument("--caption_min_frames", type=int, default=6, help="Same caption must repeat N consecutive frames")
-    # Display
+    # Display / output (그리기는 --show 일 때만, 아니면 headless)
     p.add_argument("--show", action="store_true")
-    return p.parse_args()
+    p.add_argument("--events", type=str, default="",
+                   help="Write JSONL events: per-frame state + stable caption changes (with timestamps)")
+    p.add_argument("--events_dets", action="store_true", help="Also write filtered detections per frame to --events")
+    p.add_argument("--save_video", action="store_true", help="Save the annotated video to <save_dir>/<name>.mp4")
+    p.add_argument("--save_dir", type=str, default="C:/summer/trafficlight-lite/runs/video")
+    p.add_argument("--save_queue", type=int, default=16, help="Frames buffered for the background video writer")
+    p.add_argument("--save_policy", type=str, default="block", choices=["block", "drop"],
+                   help="When the writer queue is full: block=wait (keep every frame), drop=skip the frame")
+    # Profiling (stage 별 latency 는 항상 기록, 출력만 옵션)
+    p.add_argument("--profile", action="store_true", help="Print per-stage latency table (p50/p95/p99/max) at exit")
+    p.add_argument("--profile_json", type=str, default="", help="Dump the per-stage latency summary to this JSON file")
+    p.add_argument("--hud", action="store_true", help="Draw FPS / stage latency HUD on the frame")
+    # Live metrics (metrics.py)
+    p.add_argument("--metrics_port", type=int, default=0, help="Serve Prometheus metrics on 127.0.0.1:<port>/metrics")
+    p.add_argument("--metrics_file", type=str, default="", help="Periodically rewrite this JSON stats file")
+    p.add_argument("--metrics_interval", type=float, default=5.0, help="Seconds between --metrics_file rewrites")
+    # Throughput
+    p.add_argument("--pipeline", action="store_true",
+                   help="Run decode / inference / render on separate threads")
+    p.add_argument("--queue_size", type=int, default=4, help="Bounded queue size between pipeline stages")
+    p.add_argument("--batch", type=int, default=1, help="Frames per model.predict call (micro-batching)")
+    p.add_argument("--detect_every", type=int, default=1,
+                   help="Run the detector every K frames, track boxes (optical flow) in between")
+    p.add_argument("--gate_thresh", type=float, default=0.0,
+                   help="Reuse previous detections when mean ROI gray diff (0-255, downscaled) is below this. 0=off")
+    p.add_argument("--gate_max_age", type=int, default=15, help="Max consecutive frames a detection is reused")
+    # Adaptive resolution (--target_fps)
+    p.add_argument("--target_fps", type=float, default=0.0,
+                   help="Adapt imgsz (and optionally detect_every) so measured inference holds this FPS. 0=off")
+    p.add_argument("--imgsz_set", type=str, default="384,512,640,960", help="--target_fps: allowed imgsz values")
+    p.add_argument("--adapt_max_detect_every", type=int, default=1,
+                   help="--target_fps: at the smallest imgsz, raise detect_every up to this (default: imgsz only)")
+    p.add_argument("--adapt_window", type=int, default=30, help="--target_fps: frames measured per decision")
+    p.add_argument("--adapt_log", type=str, default="",
+                   help="--target_fps: JSONL log of every change (time, frame, t_ms, imgsz, detect_every, latency)")
+    # Decoder (ffmpeg_source.py)
+    p.add_argument("--decoder", type=str, default="cv2", choices=["cv2", "ffmpeg"],
+                   help="ffmpeg = decode in an ffmpeg subprocess with decoder-side scale/crop")
+    p.add_argument("--decode_width", type=int, default=0,
+                   help="--decoder ffmpeg: scale frames to this width inside the decoder (0 = native)")
+    p.add_argument("--decode_crop", action="store_true",
+                   help="--decoder ffmpeg: decode only the ROI bounding rect")
+    p.add_argument("--ffmpeg", type=str, default="ffmpeg", help="ffmpeg executable")
+    # Multiprocessing (frame_ring.py)
+    p.add_argument("--procs", type=int, default=0,
+                   help="Inference worker processes fed by a decoder process through a shared-memory frame ring. 0=off")
+    p.add_argument("--ring_slots", type=int, default=0,
+                   help="--procs: frame slots in the shared-memory ring (0 = auto)")
+    # Segment-parallel (긴 녹화 파일 archive 처리)
+    p.add_argument("--segments", type=int, default=0,
+                   help="Split the file into N segments inferred by N processes, then merge (same result as serial)")
+    p.add_argument("--segment_warmup", type=int, default=90,
+                   help="--segments with --gate_thresh: frames inferred before each segment so detector state matches")
+    p.add_argument("--segment_dir", type=str, default="",
+                   help="Keep per-segment detection logs here (default: temp dir, removed after merge)")
+    # Live source (camera index / rtsp / http / udp ...)
+    p.add_argument("--live", action="store_true",
+                   help="Grabber thread keeps only the newest frame; stale frames are dropped (low latency)")
+    p.add_argument("--live_loop", action="store_true",
+                   help="With --live on a file: loop it at its own fps (local test of a live source)")
+    # Detection log (detlog.py)
+    p.add_argument("--record_dets", type=str, default="",
+                   help="Write raw pre-filter detections (frame, timestamp, boxes, conf, cls) to this .tldet file")
+    p.add_argument("--replay_dets", type=str, default="",
+                   help="Replay a .tldet file through filter + captions only (no model, no video decode)")
+    return p.parse_args(argv)
 
 
 def parse_min_conf_map(s: str) -> dict[int, float]:
@@ -107,6 +195,40 @@ def parse_min_conf_map(s: str) -> dict[int, float]:
     return m
 
 
+def parse_roi(s: str) -> list[float]:
+    if not s:
+        return []
+    try:
+        return [float(x) for x in s.split(",") if x.strip() != ""]
+    except Exception:
+        return []
+
+
+def is_live_source(source: str) -> bool:
+    """카메라 index ("0") 또는 스트림 URL (rtsp://, http://, udp:// ...)"""
+    return source.isdigit() or "://" in source
+
+
+def open_video(source: str, rewind: bool = True):
+    """VideoCapture 열고 첫 프레임으로 폭/높이 확인 후 되감기 → (cap, W, H)
+    rewind=False: 되감지 않음 (live 소스는 되감기 불가, 첫 프레임은 버림)
+    """
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Failed to open source: {source}")
+
+    ok, frame0 = cap.read()
+    if not ok:
+        cap.release()
+        raise RuntimeError("Failed to read first frame.")
+    H0, W0 = frame0.shape[:2]
+
+    # 첫 프레임도 처리하려면 되감기
+    if rewind:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    return cap, W0, H0
+
+
 def build_roi_polygon(norm_vals: list[float], W: int, H: int) -> np.ndarray | None:
     """정규화 roi 문자열을 픽셀 단위 polygon으로 변환"""
     if not norm_vals:
@@ -131,6 +253,12 @@ def build_roi_polygon(norm_vals: list[float], W: int, H: int) -> np.ndarray | No
     return None
 
 
+def roi_rect(roi_poly: np.ndarray, W: int, H: int) -> tuple[int, int, int, int]:
+    """ROI polygon 의 bounding rect (x0, y0, x1, y1), 프레임 안으로 clamp"""
+    x, y, w, h = cv2.boundingRect(roi_poly)
+    return max(0, x), max(0, y), min(W, x + w), min(H, y + h)
+
+
 def inside_polygon(cx: float, cy: float, polygon: np.ndarray | None) -> bool:
     if polygon is None:
         return True
@@ -145,174 +273,1565 @@ def group_of(cls_id: int) -> str | None:
 
 
 # =========================
-# Main
+# Profiling
 # =========================
-def main():
-    a = parse_args()
+class LatencyHistogram:
+    """고정 log2 버킷 히스토그램 (버킷 폭 ~9%, 1us ~ 33s). 메모리 고정, 기록 O(1) → 상시 켜둬도 됨
+    percentile 은 해당 버킷 상한 (최대 ~9% 과대), max 는 정확값
+    """
+    SUB = 8                   # 2배당 버킷 수
+    N = SUB * 25 + 1          # bucket 0 = 1us 미만, i = [2^((i-1)/SUB), 2^(i/SUB)) us
 
-    # 모델/소스 체크
-    if not Path(a.weights).exists():
-        raise FileNotFoundError(f"Weights not found: {a.weights}")
-    if not Path(a.source).exists():
-        raise FileNotFoundError(f"Source not found: {a.source}")
+    def __init__(self):
+        self.counts = [0] * self.N
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
 
-    model = YOLO(a.weights)
+    def add(self, ms: float, n: int = 1):
+        us = ms * 1000.0
+        i = min(self.N - 1, int(math.log2(us) * self.SUB) + 1) if us >= 1.0 else 0
+        self.counts[i] += n
+        self.count += n
+        self.total_ms += ms * n
+        if ms > self.max_ms:
+            self.max_ms = ms
 
-    cap = cv2.VideoCapture(a.source)
-    if not cap.isOpened():
-        raise RuntimeError(f"Failed to open source: {a.source}")
+    def merge(self, other: "LatencyHistogram"):
+        """다른 프로세스에서 기록한 히스토그램 합치기 (--segments)"""
+        self.counts = [x + y for x, y in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
 
-    # 첫 프레임에서 폭/높이 얻고 ROI polygon 구성
-    ok, frame0 = cap.read()
-    if not ok:
-        cap.release()
-        raise RuntimeError("Failed to read first frame.")
-    H0, W0 = frame0.shape[:2]
+    @classmethod
+    def upper_ms(cls, i: int) -> float:
+        return 2.0 ** (i / cls.SUB) / 1000.0
 
-    roi_vals = []
-    if a.roi:
-        try:
-            roi_vals = [float(x) for x in a.roi.split(",") if x.strip() != ""]
-        except Exception:
-            roi_vals = []
-    roi_poly = build_roi_polygon(roi_vals, W0, H0)
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        target = q / 100.0 * self.count
+        cum = 0
+        for i, c in enumerate(self.counts):
+            cum += c
+            if c and cum >= target:
+                return min(self.upper_ms(i), self.max_ms)
+        return self.max_ms
 
-    # 안정화 상태
-    stable_caption: str | None = None
-    last_change_ms = 0.0
-    # 연속 프레임 후보 상태
-    cand_caption: str | None = None
-    cand_count: int = 0
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total_ms / self.count if self.count else 0.0,
+            "p50": self.percentile(50), "p95": self.percentile(95),
+            "p99": self.percentile(99), "max": self.max_ms,
+        }
 
-    # 클래스별 임계치
-    min_conf_map = parse_min_conf_map(a.min_conf_by_cls)
 
-    # 첫 프레임도 처리하려면 되감기
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+class Profiler:
+    """stage 별 latency (ms, perf_counter). 각 stage 는 한 스레드에서만 기록 (decode / infer / 나머지는 main)
+    - decode  : cap.read
+    - infer   : 전처리(ROI crop) + 추론 + tracker/gate (배치면 프레임당으로 나눠 기록)
+    - filter / caption : DetectionFilter / CaptionStabilizer
+    - draw    : 오버레이 + HUD,  output : 이벤트/검출 기록 + 영상 저장 큐,  display : imshow + waitKey
+    - frame   : 후처리 단계에 프레임이 도착하는 간격 (1000 / 평균 = 처리 FPS)
+    - e2e     : (--live) 캡처 → 자막 반영/표시까지
+    """
+    STAGES = ("decode", "infer", "filter", "caption", "draw", "output", "display", "frame", "e2e")
 
-    while True:
-        ok, frame = cap.read()
-        if not ok:
-            break
+    def __init__(self):
+        self.hist = {k: LatencyHistogram() for k in self.STAGES}
+        self.ema = dict.fromkeys(self.STAGES, 0.0)  # HUD 용 최근값
+        # 처리 FPS 는 첫 프레임 도착부터 (모델 로딩 / export / 첫 추론 warm-up 은 빼고)
+        self.t_start: float | None = None
+        self._t_last_frame: float | None = None
+
+    def start(self):
+        """지금부터 elapsed 를 잼 (이미 시작했으면 그대로). 첫 tick() 에서 자동으로 호출"""
+        if self.t_start is None:
+            self.t_start = time.perf_counter()
+
+    def add(self, stage: str, t0: float, n: int = 1) -> float:
+        """t0 부터 지금까지를 stage 에 기록 (n 프레임 배치면 프레임당 시간으로), 현재 시각 반환"""
+        t1 = time.perf_counter()
+        self.record(stage, (t1 - t0) * 1000.0 / n, n)
+        return t1
+
+    def record(self, stage: str, ms: float, n: int = 1):
+        """이미 잰 시간(ms, 프레임당) 기록. --procs 에서 다른 프로세스가 잰 decode / infer"""
+        self.hist[stage].add(ms, n)
+        self.ema[stage] += 0.1 * (ms - self.ema[stage])
+
+    def tick(self):
+        t = time.perf_counter()
+        if self._t_last_frame is not None:
+            self.add("frame", self._t_last_frame)
+        else:
+            self.start()
+        self._t_last_frame = t
+
+    def summary(self) -> dict:
+        # elapsed = 시작 ~ 마지막 프레임 도착, fps = 그 사이 프레임 간격 수 / elapsed
+        frames = self.hist["frame"].count + (self._t_last_frame is not None)
+        elapsed = self._t_last_frame - self.t_start if self._t_last_frame is not None else 0.0
+        fps = self.hist["frame"].count / elapsed if elapsed > 0 else 0.0
+        out = {"frames": frames, "elapsed_s": elapsed, "fps": fps}
+        out["stages_ms"] = {k: h.summary() for k, h in self.hist.items() if h.count}
+        return out
+
+    def table(self) -> str:
+        sm = self.summary()
+        lines = [f"{'stage':<9}{'count':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"]
+        for k, v in sm["stages_ms"].items():
+            lines.append(f"{k:<9}{v['count']:>8}{v['mean']:>9.2f}{v['p50']:>9.2f}{v['p95']:>9.2f}"
+                         f"{v['p99']:>9.2f}{v['max']:>9.2f}")
+        lines.append(f"{sm['frames']} frames in {sm['elapsed_s']:.1f}s ({sm['fps']:.1f} fps)")
+        return "\n".join(lines)
+
+
+def draw_hud(vis: np.ndarray, prof: Profiler) -> np.ndarray:
+    e = prof.ema
+    fps = 1000.0 / e["frame"] if e["frame"] > 0 else 0.0
+    post_ms = e["filter"] + e["caption"] + e["draw"]
+    text = f"{fps:.1f} FPS | decode {e['decode']:.1f} | infer {e['infer']:.1f} | post {post_ms:.1f} ms"
+    cv2.putText(vis, text, (12, 56), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (40, 40, 40), 3, cv2.LINE_AA)
+    cv2.putText(vis, text, (12, 56), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 1, cv2.LINE_AA)
+    return vis
+
+
+# =========================
+# Stages (추론 → 후처리 → 자막 안정화 → 그리기)
+# =========================
+def infer_batch(model, frames: list[np.ndarray], a) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """N 프레임을 한 번의 predict 호출로 추론 → 프레임별 (xyxy, conf, cls). model 은 detector_backends 백엔드"""
+    return model.predict(frames, imgsz=a.imgsz, conf=a.conf, iou=a.iou)
+
+
+class RoiCropper:
+    """ROI polygon 의 bounding rect 만 잘라서 추론 → 박스를 전체 프레임 좌표로 복원
+    - 같은 imgsz 에서 멀리 있는 작은 신호등의 유효 해상도 ↑ (또는 더 작은 imgsz 로 같은 정확도)
+    - mask=True 면 rect 안에서도 polygon 바깥 픽셀은 0 으로 지움
+    """
+    def __init__(self, roi_poly: np.ndarray, W: int, H: int, mask: bool = False):
+        self.x0, self.y0, self.x1, self.y1 = roi_rect(roi_poly, W, H)
+        if self.x1 <= self.x0 or self.y1 <= self.y0:
+            raise ValueError(f"ROI does not overlap the frame: {roi_poly.tolist()}")
+        self.mask = None
+        if mask:
+            self.mask = np.zeros((self.y1 - self.y0, self.x1 - self.x0), np.uint8)
+            cv2.fillPoly(self.mask, [roi_poly - np.array([self.x0, self.y0], np.int32)], 255)
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        img = frame[self.y0:self.y1, self.x0:self.x1]
+        if self.mask is not None:
+            # 새 배열 → 원본 프레임(그리기용)은 그대로
+            img = cv2.bitwise_and(img, img, mask=self.mask)
+        return img
+
+    def restore(self, raw: tuple[np.ndarray, np.ndarray, np.ndarray]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        xyxy, confs, clss = raw
+        xyxy = xyxy + np.array([self.x0, self.y0, self.x0, self.y0], dtype=xyxy.dtype)
+        return xyxy, confs, clss
+
+
+class BoxTracker:
+    """키프레임 검출 박스를 다음 프레임들로 전파 (Lucas-Kanade optical flow)
+    - 박스마다 안쪽 3x3 격자 점을 추적 → 이동량 median 만큼 박스 평행이동
+    - 추적 성공 점이 min_points 미만인 박스는 버림 (conf/cls 는 키프레임 값 유지)
+    - rect(x0,y0,x1,y1) 가 있으면 그 영역(ROI bounding rect)만 gray 변환/추적
+    """
+    GRID = np.array([(u, v) for v in (0.25, 0.5, 0.75) for u in (0.25, 0.5, 0.75)], np.float32)
+
+    def __init__(self, rect: tuple[int, int, int, int] | None = None, min_points: int = 3):
+        self.rect = rect
+        self.min_points = min_points
+        self.prev_gray: np.ndarray | None = None
+        self.raw: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+
+    def _gray(self, frame: np.ndarray) -> np.ndarray:
+        if self.rect is not None:
+            x0, y0, x1, y1 = self.rect
+            frame = frame[y0:y1, x0:x1]
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def reset(self, frame: np.ndarray, raw: tuple[np.ndarray, np.ndarray, np.ndarray]):
+        self.prev_gray = self._gray(frame)
+        self.raw = raw
+
+    def update(self, frame: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        gray = self._gray(frame)
+        xyxy, confs, clss = self.raw
+        n = len(xyxy)
+        if n == 0:
+            self.prev_gray = gray
+            return self.raw
 
+        ox, oy = (self.rect[0], self.rect[1]) if self.rect is not None else (0, 0)
+        wh = (xyxy[:, 2:4] - xyxy[:, 0:2])[:, None, :]
+        pts = xyxy[:, None, 0:2] + wh * self.GRID[None, :, :] - np.array([ox, oy], np.float32)
+        pts = pts.reshape(-1, 1, 2).astype(np.float32)
+        nxt, st, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, pts, None,
+                                              winSize=(15, 15), maxLevel=2)
+        k = len(self.GRID)
+        d = (nxt - pts).reshape(n, k, 2)
+        ok = st.reshape(n, k).astype(bool)
+        d[~ok] = np.nan
+
+        keep = ok.sum(axis=1) >= self.min_points
+        shift = np.zeros((n, 2), np.float32)
+        if keep.any():
+            shift[keep] = np.nanmedian(d[keep], axis=1)
+        xyxy = (xyxy + np.concatenate([shift, shift], axis=1))[keep].astype(np.float32)
         H, W = frame.shape[:2]
+        xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, W)
+        xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, H)
 
-        # 추론
-        r = model.predict(
-            frame, imgsz=a.imgsz, conf=a.conf, iou=a.iou,
-            device=a.device, verbose=False
-        )
-        boxes = r[0].boxes if r and len(r) > 0 else None
-
-        detections = []
-        if boxes is not None and boxes.xyxy is not None and len(boxes) > 0:
-            xyxy = boxes.xyxy.cpu().numpy()
-            confs = boxes.conf.cpu().numpy()
-            clss = boxes.cls.cpu().numpy().astype(int)
-
-            for (x1, y1, x2, y2), c, k in zip(xyxy, confs, clss):
-                # 면적 필터
-                area = (x2 - x1) * (y2 - y1)
-                if area < a.min_area:
-                    continue
+        self.prev_gray = gray
+        self.raw = (xyxy, confs[keep], clss[keep])
+        return self.raw
 
-                # ROI 필터 (중심점 기준)
-                cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
-                if not inside_polygon(cx, cy, roi_poly):
-                    continue
 
-                # 클래스별 최소 conf
-                thr = max(a.conf, min_conf_map.get(int(k), a.conf))
-                if float(c) < thr:
-                    continue
+class SceneGate:
+    """ROI 안의 축소 gray 프레임 차이가 작으면 모델 추론 생략 → 직전 검출 재사용 (정차 중 반복 추론 방지)
+    - 비교 기준은 마지막으로 '추론한' 프레임 (천천히 변하는 장면도 누적 차이로 잡힘)
+    - 강제 추론 프레임(force)은 FrameDetector 가 영상 기준 frame index 로 정함: (max_age + 1) 번째 판단마다
+      → 재사용은 최대 max_age 번 연속 (신호 변경을 놓치지 않도록), 어디서 시작해도 같은 프레임에서 기준이 갱신됨
+        (--segments 구간들이 같은 기준 프레임을 공유)
+    """
+    def __init__(self, thresh: float, max_age: int, roi_poly: np.ndarray | None, W: int, H: int,
+                 size: int = 64):
+        self.thresh = thresh
+        self.max_age = max_age
+        self.rect = roi_rect(roi_poly, W, H) if roi_poly is not None else (0, 0, W, H)
+        x0, y0, x1, y1 = self.rect
+        scale = size / max(x1 - x0, y1 - y0)
+        self.small_wh = (max(1, round((x1 - x0) * scale)), max(1, round((y1 - y0) * scale)))
+        self.mask = None
+        if roi_poly is not None:
+            self.mask = np.zeros(self.small_wh[::-1], np.uint8)
+            pts = np.round((roi_poly - np.array([x0, y0])) * scale).astype(np.int32)
+            cv2.fillPoly(self.mask, [pts], 255)
+        self.ref: np.ndarray | None = None
+        self.inferred = 0
+        self.reused = 0
+
+    def reuse(self, frame: np.ndarray, force: bool = False) -> bool:
+        """True = 직전 검출 재사용, False = 추론 필요 (이 프레임이 새 기준이 됨). force = 강제 추론 프레임"""
+        x0, y0, x1, y1 = self.rect
+        small = cv2.resize(frame[y0:y1, x0:x1], self.small_wh, interpolation=cv2.INTER_AREA)
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if self.ref is not None and not force:
+            diff = cv2.mean(cv2.absdiff(small, self.ref), mask=self.mask)[0]
+            if diff < self.thresh:
+                self.reused += 1
+                return True
+        self.ref = small
+        self.inferred += 1
+        return False
+
+
+class ResolutionController:
+    """--target_fps: 측정한 추론 latency (프레임당, adapt_window 프레임 평균) 로 imgsz / detect_every 조절
+    - 단계(ladder): 큰 imgsz → 작은 imgsz → 가장 작은 imgsz 에서 detect_every (--detect_every + 1 .. adapt_max_detect_every)
+    - 예산 초과면 바로 한 단계 가볍게. 한 단계 무거운 설정의 예상 latency (imgsz^2 / detect_every 비례) 가
+      예산의 headroom 배 안인 window 가 up_windows 번 연속이면 한 단계 무겁게
+    - 올리자마자 첫 window 에서 다시 내려오면 up_windows 2배 (gate 처럼 latency 가 들쭉날쭉할 때 진동 방지)
+    - 예산 = 1000 / target_fps. serial 이면 추론 외 stage (decode / 후처리 / 표시) 시간을 뺀 나머지
+    - 바꾼 직후 첫 호출은 새 입력 크기 warm-up 이라 측정에서 뺌
+    - 변경마다 [ADAPT] 출력 + --adapt_log JSONL (정확도와 맞춰 보려고 frame index / 영상 시각 같이 기록)
+    """
+    OTHER_STAGES = ("decode", "filter", "caption", "draw", "output", "display")
+
+    def __init__(self, a, prof: Profiler, fps: float, overlapped: bool = False, headroom: float = 0.8):
+        self.a = a
+        self.prof = prof
+        self.fps = fps
+        self.overlapped = overlapped  # --pipeline: 다른 stage 는 다른 스레드 → 추론 예산 = 프레임 예산 전체
+        self.headroom = headroom
+        sizes = sorted({int(x) for x in a.imgsz_set.split(",") if x.strip()}, reverse=True)
+        if not sizes:
+            raise ValueError("--imgsz_set is empty")
+        k0 = a.detect_every
+        self.ladder = [(sz, k0) for sz in sizes] + [(sizes[-1], k) for k in range(k0 + 1, a.adapt_max_detect_every + 1)]
+        # 시작 단계: 현재 --imgsz 이하 중 가장 큰 것 (없으면 가장 작은 것)
+        self.level = next((i for i, (sz, _) in enumerate(self.ladder) if sz <= a.imgsz), len(sizes) - 1)
+        self.log = None
+        if a.adapt_log:
+            Path(a.adapt_log).parent.mkdir(parents=True, exist_ok=True)
+            self.log = open(a.adapt_log, "w", encoding="utf-8")
+        self.changes = 0
+        self.frames_at: dict[tuple[int, int], int] = {}
+        self.up_windows = 2
+        self._good = 0      # 연속으로 여유 있던 window 수
+        self._since = 0     # 마지막 변경 후 판단한 window 수
+        self._last = "start"
+        self._ms = 0.0
+        self._n = 0
+        self._skip = 1
+        self._apply(0, "start", 0.0)
+
+    def budget_ms(self) -> float:
+        frame_ms = 1000.0 / self.a.target_fps
+        if self.overlapped:
+            return frame_ms
+        other = sum(self.prof.ema[k] for k in self.OTHER_STAGES)
+        return max(0.1 * frame_ms, frame_ms - other)
+
+    @staticmethod
+    def cost(step: tuple[int, int]) -> float:
+        sz, k = step
+        return sz * sz / k
+
+    def _apply(self, frame_idx: int, reason: str, infer_ms: float):
+        prev = (self.a.imgsz, self.a.detect_every)
+        self.a.imgsz, self.a.detect_every = self.ladder[self.level]
+        rec = {"time": round(time.time(), 3), "frame": frame_idx, "t_ms": round(frame_idx * 1000.0 / self.fps, 1),
+               "reason": reason, "imgsz": self.a.imgsz, "detect_every": self.a.detect_every,
+               "prev_imgsz": prev[0], "prev_detect_every": prev[1],
+               "infer_ms": round(infer_ms, 2), "budget_ms": round(self.budget_ms(), 2)}
+        if reason != "start":
+            self.changes += 1
+            print(f"[ADAPT] frame {frame_idx}: infer {infer_ms:.1f} ms / budget {rec['budget_ms']:.1f} ms → "
+                  f"imgsz {prev[0]} → {self.a.imgsz}, detect_every {prev[1]} → {self.a.detect_every}")
+        if self.log is not None:
+            self.log.write(json.dumps(rec) + "\n")
+            self.log.flush()
+        self._last = reason
+        self._ms, self._n, self._skip, self._good, self._since = 0.0, 0, 1, 0, 0
+
+    def update(self, frame_idx: int, ms: float, n: int):
+        """FrameDetector 호출마다 (ms = 프레임당 추론 시간, n = 프레임 수). frame_idx = 다음 프레임 index"""
+        step = self.ladder[self.level]
+        self.frames_at[step] = self.frames_at.get(step, 0) + n
+        if self._skip:
+            self._skip -= 1
+            return
+        self._ms += ms * n
+        self._n += n
+        if self._n < self.a.adapt_window:
+            return
+        mean = self._ms / self._n
+        budget = self.budget_ms()
+        self._ms, self._n = 0.0, 0
+        if mean > budget:
+            self._good = 0
+            if self.level < len(self.ladder) - 1:
+                if self._last == "under_budget" and self._since == 0:
+                    self.up_windows = min(64, 2 * self.up_windows)
+                self.level += 1
+                self._apply(frame_idx, "over_budget", mean)
+                return
+        elif self.level > 0 and mean * self.cost(self.ladder[self.level - 1]) / self.cost(step) < budget * self.headroom:
+            self._good += 1
+            if self._good >= self.up_windows:
+                self.level -= 1
+                self._apply(frame_idx, "under_budget", mean)
+                return
+        else:
+            self._good = 0
+        self._since += 1
+
+    def report(self) -> str:
+        used = ", ".join(f"{sz}/K{k}: {n}" for (sz, k), n in sorted(self.frames_at.items(), reverse=True))
+        return f"{self.changes} changes, frames per imgsz/detect_every: {used}"
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+
+
+class FrameDetector:
+    """프레임 묶음 → 프레임별 원시 검출 (xyxy, conf, cls). 모델 입력 준비(ROI crop 등)는 여기서
+    - detect_every > 1 이면 키프레임(K 프레임마다)만 모델 추론, 나머지는 BoxTracker 로 전파
+    - gate 가 있으면 추론할 프레임이라도 장면 변화가 작으면 직전 검출 재사용
+    - 프레임 순서대로 호출된다고 가정 (serial / pipeline 모두 추론 워커 1개)
+    """
+    def __init__(self, model, a, cropper: RoiCropper | None = None, tracker: BoxTracker | None = None,
+                 gate: SceneGate | None = None):
+        self.model = model
+        self.a = a
+        self.cropper = cropper
+        self.tracker = tracker
+        self.gate = gate
+        self.frame_idx = 0
+        self._last_raw: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+        self.fresh: list[bool] = []  # 마지막 호출의 프레임별 모델 추론 여부 (False = tracker 전파 / gate 재사용)
+        self.adapt: ResolutionController | None = None  # --target_fps
+        self._k = a.detect_every
+        self._key0 = 0  # 키프레임 기준 frame index (detect_every 가 바뀌면 그 프레임부터 다시 셈)
+        self.prof = Profiler()  # main() 에서 FramePostProcessor 와 같은 Profiler 로 교체
+
+    def _detect(self, frames: list[np.ndarray]) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        if self.cropper is None:
+            return infer_batch(self.model, frames, self.a)
+        raws = infer_batch(self.model, [self.cropper.crop(f) for f in frames], self.a)
+        return [self.cropper.restore(r) for r in raws]
+
+    def __call__(self, frames: list[np.ndarray]) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        t0 = time.perf_counter()
+        out = self._run(frames)
+        n = max(1, len(frames))
+        t1 = self.prof.add("infer", t0, n)
+        if self.adapt is not None:
+            self.adapt.update(self.frame_idx, (t1 - t0) * 1000.0 / n, n)
+        return out
+
+    def _run(self, frames: list[np.ndarray]) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        K = self.a.detect_every
+        if K != self._k:  # --target_fps 가 바꿈 → 이번 프레임을 키프레임으로
+            self._k, self._key0 = K, self.frame_idx
+        tracking = self.tracker is not None and K > 1
+        # gate 강제 추론 주기 (frame 단위, tracking 이면 키프레임만 gate 를 거침)
+        refresh = (self.gate.max_age + 1) * (K if tracking else 1) if self.gate is not None else 0
+        if not tracking and self.gate is None:
+            self.frame_idx += len(frames)
+            self.fresh = [True] * len(frames)
+            return self._detect(frames)
+
+        # 1) 프레임별 계획: None = tracker 전파, int = 이번 배치 추론 결과 index, tuple = 이전 검출 재사용
+        plan: list = []
+        to_detect: list[np.ndarray] = []
+        last = self._last_raw
+        self.fresh = []
+        for i, frame in enumerate(frames):
+            fresh = False
+            if tracking and (self.frame_idx + i - self._key0) % K != 0:
+                plan.append(None)
+            elif self.gate is not None and self.gate.reuse(frame, (self.frame_idx + i - self._key0) % refresh == 0):
+                plan.append(last)  # 첫 프레임은 기준이 없으므로 항상 추론
+            else:
+                last = len(to_detect)
+                to_detect.append(frame)
+                plan.append(last)
+                fresh = True
+            self.fresh.append(fresh)
+
+        # 2) 추론할 프레임만 한 번에 추론 → 순서대로 tracker reset / update
+        raws = self._detect(to_detect) if to_detect else []
+        out = []
+        for frame, p in zip(frames, plan):
+            if p is None:
+                out.append(self.tracker.update(frame))
+                continue
+            raw = raws[p] if isinstance(p, int) else p
+            if tracking:
+                self.tracker.reset(frame, raw)
+            out.append(raw)
+        self._last_raw = raws[last] if isinstance(last, int) else last
+        self.frame_idx += len(frames)
+        return out
+
+
+class Detections:
+    """필터 통과한 검출 (compact 배열). 자막 로직/그리기가 그대로 읽음
+    xyxy: (N,4) int32, conf: (N,) float32, cls: (N,) int16, grp: (N,) int8 (GROUP_PRIORITY index, -1=없음)
+    """
+    __slots__ = ("xyxy", "conf", "cls", "grp")
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray, grp: np.ndarray):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.grp = grp
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    def to_dicts(self) -> list[dict]:
+        """예전 dict 형식 ({"bbox","conf","cls","name"})"""
+        return [{
+            "bbox": tuple(b),
+            "conf": c,
+            "cls": k,
+            "name": ID_TO_NAME.get(k, f"class_{k}"),
+        } for b, c, k in zip(self.xyxy.tolist(), self.conf.tolist(), self.cls.tolist())]
+
+
+class DetectionFilter:
+    """면적 / ROI(중심점) / 클래스별 최소 conf 필터를 numpy boolean mask 로 한 번에
+    - 클래스별 임계치 벡터: max(conf, min_conf_by_cls[k])
+    - ROI 는 해상도별로 한 번 래스터화한 bitmap → inside 검사는 배열 인덱싱 한 번
+      (경계 포함, 픽셀 단위로 cv2.pointPolygonTest(...) >= 0 과 동일)
+    """
+    def __init__(self, a, roi_poly: np.ndarray | None):
+        self.a = a
+        self.roi_poly = roi_poly
+        min_conf_map = parse_min_conf_map(a.min_conf_by_cls)
+        n = max([NUM_CLASSES] + [k + 1 for k in min_conf_map if k >= 0])
+        self.cls_thr = np.full(n, a.conf, np.float64)
+        for k, v in min_conf_map.items():
+            if k >= 0:
+                self.cls_thr[k] = max(a.conf, v)
+        self.cls_grp = np.full(n, -1, np.int8)
+        self.cls_grp[:NUM_CLASSES] = CLS_TO_GROUP
+        self._roi_masks: dict[tuple[int, int], np.ndarray] = {}
 
-                detections.append({
-                    "bbox": (int(x1), int(y1), int(x2), int(y2)),
-                    "conf": float(c),
-                    "cls": int(k),
-                    "name": ID_TO_NAME.get(int(k), f"class_{int(k)}")
-                })
+    def roi_mask(self, W: int, H: int) -> np.ndarray:
+        m = self._roi_masks.get((W, H))
+        if m is None:
+            m = np.zeros((H, W), np.uint8)
+            cv2.fillPoly(m, [self.roi_poly], 1)
+            # fillPoly 는 경계에서 ±1px 오차 → 경계 근처 픽셀만 pointPolygonTest 로 다시 판정
+            band = np.zeros_like(m)
+            cv2.polylines(band, [self.roi_poly], isClosed=True, color=1, thickness=3)
+            ys, xs = np.nonzero(band)
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                m[y, x] = cv2.pointPolygonTest(self.roi_poly, (x, y), False) >= 0
+            m = m.astype(bool)
+            self._roi_masks[(W, H)] = m
+        return m
+
+    def __call__(self, raw: tuple[np.ndarray, np.ndarray, np.ndarray], W: int, H: int) -> Detections:
+        xyxy, confs, clss = raw
+        clss = clss.astype(np.int64, copy=False)
+        x1, y1, x2, y2 = xyxy[:, 0], xyxy[:, 1], xyxy[:, 2], xyxy[:, 3]
+
+        # 면적 필터
+        keep = (x2 - x1) * (y2 - y1) >= self.a.min_area
+
+        # 클래스별 최소 conf (모르는 class id 는 기본 conf)
+        known = (clss >= 0) & (clss < len(self.cls_thr))
+        idx = np.where(known, clss, 0)
+        thr = np.where(known, self.cls_thr[idx], self.a.conf)
+        keep &= confs >= thr
 
-        # 그룹/클래스 통계
-        group_counts: dict[str, int] = {}
-        group_best_conf: dict[str, float] = {g: 0.0 for g in GROUPS.keys()}
-        class_counts: dict[int, int] = {}
+        # ROI 필터 (중심점 기준)
+        if self.roi_poly is not None and keep.any():
+            cx = ((x1 + x2) / 2).astype(np.int64)
+            cy = ((y1 + y2) / 2).astype(np.int64)
+            m = self.roi_mask(W, H)
+            keep &= m[np.clip(cy, 0, H - 1), np.clip(cx, 0, W - 1)]
 
-        for d in detections:
-            gid = group_of(d["cls"])
-            if gid:
-                group_counts[gid] = group_counts.get(gid, 0) + 1
-                group_best_conf[gid] = max(group_best_conf[gid], d["conf"])
-            class_counts[d["cls"]] = class_counts.get(d["cls"], 0) + 1
+        grp = np.where(known, self.cls_grp[idx], -1).astype(np.int8)
+        return Detections(xyxy[keep].astype(np.int32),
+                          confs[keep].astype(np.float32),
+                          clss[keep].astype(np.int16),
+                          grp[keep])
 
-        present_groups = [g for g in GROUP_PRIORITY if g in group_counts]
-        frame_state = present_groups[0] if present_groups else "NONE"
+
+class CaptionStabilizer:
+    """프레임별 캡션 후보 → N 프레임 연속 + 디바운스를 통과한 자막"""
+    def __init__(self, a):
+        self.a = a
+        # 안정화 상태
+        self.stable_caption: str | None = None
+        self.last_change_ms = float("-inf")  # 첫 자막은 디바운스 없이 (--clock video 는 0ms 에서 시작)
+        # 연속 프레임 후보 상태
+        self.cand_caption: str | None = None
+        self.cand_count: int = 0
+
+    def update(self, dets: Detections, now_ms: float) -> str:
+        """검출 결과로 상태 갱신 후 frame_state 반환 (자막은 self.stable_caption)"""
+        a = self.a
+
+        # 그룹 통계 (GROUP_PRIORITY 순서 → 처음 등장하는 그룹이 frame_state)
+        grp = dets.grp
+        group_counts = np.bincount(grp[grp >= 0], minlength=len(GROUP_PRIORITY))
+        present = np.flatnonzero(group_counts)
+        gi = int(present[0]) if len(present) else -1
+        frame_state = GROUP_PRIORITY[gi] if gi >= 0 else "NONE"
 
         # 프레임 후보 캡션(즉시)
         perframe_caption: str | None = None
-        if a.captions and frame_state in GROUPS:
-            # 해당 그룹 대표 클래스(가장 많이 보이는 클래스) 선택
-            top_cls = None
-            top_cnt = 0
-            for k, cnt in class_counts.items():
-                if k in GROUPS[frame_state] and cnt > top_cnt:
-                    top_cnt = cnt
-                    top_cls = k
-
-            if (group_counts.get(frame_state, 0) >= a.caption_min_tracks and
-                    group_best_conf.get(frame_state, 0.0) >= a.caption_min_conf and
-                    top_cls is not None):
+        if a.captions and gi >= 0:
+            in_group = grp == gi
+            members = dets.cls[in_group]
+            # 해당 그룹 대표 클래스(가장 많이 보이는 클래스, 동률이면 먼저 나온 클래스)
+            cnt = np.bincount(members)
+            top_cls = int(members[np.argmax(cnt[members] == cnt.max())])
+            best_conf = float(dets.conf[in_group].max())
+
+            if (int(group_counts[gi]) >= a.caption_min_tracks and
+                    best_conf >= a.caption_min_conf):
                 perframe_caption = caption_text(frame_state, top_cls)
 
         # N 프레임 연속 조건
-        if perframe_caption != cand_caption:
-            cand_caption = perframe_caption
-            cand_count = 1 if perframe_caption else 0
+        if perframe_caption != self.cand_caption:
+            self.cand_caption = perframe_caption
+            self.cand_count = 1 if perframe_caption else 0
         else:
             if perframe_caption:
-                cand_count += 1
+                self.cand_count += 1
 
         new_caption: str | None = None
-        if cand_caption and cand_count >= a.caption_min_frames:
-            new_caption = cand_caption
+        if self.cand_caption and self.cand_count >= a.caption_min_frames:
+            new_caption = self.cand_caption
 
         # 디바운스(자막 변경 최소 간격)
-        now_ms = time.time() * 1000.0
-        if new_caption != stable_caption:
-            if (now_ms - last_change_ms) >= a.debounce_ms:
-                stable_caption = new_caption
-                last_change_ms = now_ms
-
-        # 그리기
-        vis = frame
-
-        if a.draw_roi and roi_poly is not None:
-            cv2.polylines(vis, [roi_poly], isClosed=True, color=(255, 180, 0), thickness=2)
-
-        for d in detections:
-            x1, y1, x2, y2 = d["bbox"]
-            label = f'{d["name"]}:{d["conf"]:.2f}'
-            cv2.rectangle(vis, (x1, y1), (x2, y2), (0, 220, 0), 2)
-            cv2.putText(vis, label, (x1, max(12, y1 - 6)),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (40, 40, 40), 3, cv2.LINE_AA)
-            cv2.putText(vis, label, (x1, max(12, y1 - 6)),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (240, 255, 240), 1, cv2.LINE_AA)
-
-        cv2.putText(vis, f"FRAME_STATE: {frame_state}", (12, 28),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (50, 220, 255), 2, cv2.LINE_AA)
-
-        if stable_caption:
-            cv2.rectangle(vis, (0, H - 60), (W, H), (0, 0, 0), -1)
-            cv2.putText(vis, stable_caption, (16, H - 22),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 255), 2, cv2.LINE_AA)
-
-        if a.show:
-            cv2.imshow("traffic-light", vis)
-            if cv2.waitKey(1) & 0xFF == 27:  # ESC
+        if new_caption != self.stable_caption:
+            if (now_ms - self.last_change_ms) >= a.debounce_ms:
+                self.stable_caption = new_caption
+                self.last_change_ms = now_ms
+
+        return frame_state
+
+
+class EventWriter:
+    """--events: JSONL 이벤트 스트림
+    - 프레임마다 {"type": "frame", "frame", "t_ms", "state", "caption"} (+ --events_dets 면 "dets": [[cls, conf, x1, y1, x2, y2], ...])
+    - 자막이 바뀌면 {"type": "caption", "frame", "t_ms", "caption", "prev"}
+    """
+    def __init__(self, path: str, dets: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.f = open(self.path, "w", encoding="utf-8")
+        self.dets = dets
+        self.caption: str | None = None
+        self.frames = 0
+        self.changes = 0
+
+    def _emit(self, rec: dict):
+        self.f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def write(self, frame_idx: int, t_ms: float, frame_state: str, caption: str | None, dets: Detections):
+        rec = {"type": "frame", "frame": frame_idx, "t_ms": round(t_ms, 1), "state": frame_state, "caption": caption}
+        if self.dets:
+            rec["dets"] = [[k, round(c, 3)] + b for b, c, k in
+                           zip(dets.xyxy.tolist(), dets.conf.tolist(), dets.cls.tolist())]
+        self._emit(rec)
+        self.frames += 1
+        if caption != self.caption:
+            self._emit({"type": "caption", "frame": frame_idx, "t_ms": round(t_ms, 1),
+                        "caption": caption, "prev": self.caption})
+            self.caption = caption
+            self.changes += 1
+
+    def close(self):
+        self.f.close()
+
+
+class VideoSaver:
+    """--save_video: 그린 프레임을 백그라운드 스레드에서 인코딩 (bounded queue, 프레임은 복사 없이 참조만 넘김)
+    - block: 큐가 차면 기다림 → 모든 프레임 저장, 대신 처리 속도가 인코딩 속도로 제한될 수 있음 (backpressure)
+    - drop : 큐가 차면 그 프레임은 저장 안 함 → 처리 지연 없음, 저장 영상에 프레임 누락
+    """
+    def __init__(self, path: str, fps: float, size: tuple[int, int], queue_size: int = 16, policy: str = "block"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.writer = cv2.VideoWriter(str(self.path), cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+        if not self.writer.isOpened():
+            raise RuntimeError(f"Failed to open video writer: {self.path}")
+        self.policy = policy
+        self.q: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.written = 0
+        self.dropped = 0
+        self.waits = 0
+        self.wait_ms = 0.0
+        self.thread = StageThread("video-writer", self._loop)
+        self.thread.start()
+
+    def _loop(self):
+        while True:
+            vis = self.q.get()
+            if vis is END:
+                break
+            self.writer.write(vis)
+            self.written += 1
+
+    def write(self, vis: np.ndarray):
+        try:
+            self.q.put_nowait(vis)
+            return
+        except queue.Full:
+            pass
+        if self.policy == "drop":
+            self.dropped += 1
+            return
+        self.waits += 1
+        t0 = time.perf_counter()
+        while self.thread.is_alive():
+            try:
+                self.q.put(vis, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self.wait_ms += (time.perf_counter() - t0) * 1000.0
+        if self.thread.error is not None:
+            raise self.thread.error
+
+    def close(self):
+        if self.thread.is_alive():
+            self.q.put(END)
+        self.thread.join()
+        self.writer.release()
+        if self.thread.error is not None:
+            raise self.thread.error
+
+    def report(self) -> str:
+        if self.policy == "drop":
+            return f"{self.written} frames → {self.path} (drop policy: {self.dropped} frames dropped)"
+        return (f"{self.written} frames → {self.path} (block policy: backpressure {self.waits} times, "
+                f"{self.wait_ms:.0f} ms waited)")
+
+
+def draw_overlay(vis: np.ndarray, dets: Detections, frame_state: str,
+                 stable_caption: str | None, roi_poly: np.ndarray | None, a) -> np.ndarray:
+    H, W = vis.shape[:2]
+
+    if a.draw_roi and roi_poly is not None:
+        cv2.polylines(vis, [roi_poly], isClosed=True, color=(255, 180, 0), thickness=2)
+
+    for (x1, y1, x2, y2), c, k in zip(dets.xyxy.tolist(), dets.conf.tolist(), dets.cls.tolist()):
+        label = f'{ID_TO_NAME.get(k, f"class_{k}")}:{c:.2f}'
+        cv2.rectangle(vis, (x1, y1), (x2, y2), (0, 220, 0), 2)
+        cv2.putText(vis, label, (x1, max(12, y1 - 6)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (40, 40, 40), 3, cv2.LINE_AA)
+        cv2.putText(vis, label, (x1, max(12, y1 - 6)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (240, 255, 240), 1, cv2.LINE_AA)
+
+    cv2.putText(vis, f"FRAME_STATE: {frame_state}", (12, 28),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (50, 220, 255), 2, cv2.LINE_AA)
+
+    if stable_caption:
+        cv2.rectangle(vis, (0, H - 60), (W, H), (0, 0, 0), -1)
+        cv2.putText(vis, stable_caption, (16, H - 22),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 255), 2, cv2.LINE_AA)
+    return vis
+
+
+class FramePostProcessor:
+    """후처리 + 자막 안정화 + 그리기/표시. serial/pipeline 공용 (항상 프레임 순서대로 호출)"""
+    def __init__(self, a, roi_poly: np.ndarray | None, window: str = "traffic-light", fps: float = 30.0):
+        self.a = a
+        self.roi_poly = roi_poly
+        self.window = window
+        self.fps = fps
+        self.filter = DetectionFilter(a, roi_poly)
+        self.stabilizer = CaptionStabilizer(a)
+        self.recorder = None  # detlog.DetLogWriter (--record_dets)
+        self.events: EventWriter | None = None  # --events
+        self.saver: VideoSaver | None = None    # --save_video
+        self.frame_idx = 0  # 시각 / 이벤트용 frame index (--live 면 캡처 seq, 건너뛴 프레임 포함)
+        self.processed = 0  # 실제 처리한 프레임 수
+        self.render = bool(a.show)  # 표시할 곳이 없으면 그리기 생략 (headless)
+        self.prof = Profiler()
+        # live metrics 용 카운터 (metrics.py 가 읽기만 함)
+        self.queues: dict[str, queue.Queue] = {}
+        self.dropped: dict[str, int] = {}
+        self.group_counts = np.zeros(len(GROUP_PRIORITY), np.int64)
+        self.caption_changes = 0
+        self.mapping = None  # ffmpeg_source.FrameMapping (--decoder ffmpeg): 디코딩 좌표 → 원본 좌표
+
+    def update_args(self, a, roi_poly: np.ndarray | None):
+        """파라미터 교체 (다음 프레임부터 반영). 자막 안정화 상태는 유지"""
+        self.filter = DetectionFilter(a, roi_poly)  # 잘못된 값이면 여기서 ValueError → 나머지는 그대로
+        self.a = a
+        self.roi_poly = roi_poly
+        self.stabilizer.a = a
+        self.render = bool(a.show) or self.saver is not None
+
+    def clock_ms(self) -> float:
+        """이번 프레임 시각 (ms). --clock video 면 frame index / fps → 처리 속도와 무관하게 같은 자막"""
+        if self.a.clock == "video":
+            return self.frame_idx * 1000.0 / self.fps
+        return time.time() * 1000.0
+
+    def step(self, raw: tuple[np.ndarray, np.ndarray, np.ndarray], W: int, H: int,
+             now_ms: float) -> tuple[Detections, str]:
+        """필터 → 자막 안정화 → 이벤트 기록 (그리기 없음). --replay_dets 도 이 경로"""
+        prof = self.prof
+        idx = self.frame_idx
+        self.frame_idx += 1
+        self.processed += 1
+        t = time.perf_counter()
+        dets = self.filter(raw, W, H)
+        t = prof.add("filter", t)
+        prev = self.stabilizer.stable_caption
+        frame_state = self.stabilizer.update(dets, now_ms)
+        t = prof.add("caption", t)
+        if len(dets):
+            grp = dets.grp
+            self.group_counts += np.bincount(grp[grp >= 0], minlength=len(GROUP_PRIORITY))
+        if self.stabilizer.stable_caption != prev:
+            self.caption_changes += 1
+        if self.recorder is not None or self.events is not None:
+            if self.recorder is not None:
+                self.recorder.write(idx, now_ms, raw)
+            if self.events is not None:
+                self.events.write(idx, now_ms, frame_state, self.stabilizer.stable_caption, dets)
+            prof.add("output", t)
+        return dets, frame_state
+
+    def process(self, frame: np.ndarray, raw: tuple[np.ndarray, np.ndarray, np.ndarray]) -> np.ndarray | None:
+        """필터 → 자막 안정화 → 그리기 (표시는 안 함). render 가 꺼져 있으면 그리지 않고 None"""
+        self.prof.tick()
+        m = self.mapping
+        if m is None:
+            H, W = frame.shape[:2]
+        else:
+            # 검출은 디코딩(축소/crop) 좌표 → 원본 좌표에서 필터/자막, 그릴 때만 다시 디코딩 좌표로
+            raw, W, H = m.to_orig(raw), m.W0, m.H0
+        dets, frame_state = self.step(raw, W, H, self.clock_ms())
+        if not self.render:
+            return None
+
+        t0 = time.perf_counter()
+        roi_poly = self.roi_poly
+        if m is not None:
+            dets = Detections(m.xyxy_to_view(dets.xyxy), dets.conf, dets.cls, dets.grp)
+            roi_poly = m.poly_to_view(roi_poly)
+        vis = draw_overlay(frame, dets, frame_state,
+                           self.stabilizer.stable_caption, roi_poly, self.a)
+        if self.a.hud:
+            draw_hud(vis, self.prof)
+        self.prof.add("draw", t0)
+        return vis
+
+    def __call__(self, frame: np.ndarray, raw: tuple[np.ndarray, np.ndarray, np.ndarray]) -> bool:
+        """False 반환 시 종료 (ESC)"""
+        vis = self.process(frame, raw)
+        if vis is not None and self.saver is not None:
+            t0 = time.perf_counter()
+            self.saver.write(vis)
+            self.prof.add("output", t0)
+        if vis is not None and self.a.show:
+            t0 = time.perf_counter()
+            cv2.imshow(self.window, vis)
+            key = cv2.waitKey(1) & 0xFF
+            self.prof.add("display", t0)
+            if key == 27:  # ESC
+                return False
+        return True
+
+
+def load_model(a):
+    """--server 가 있으면 상주 detector_server 에 추론 위임 (모델 로딩 없음), 아니면 --backend"""
+    if a.server:
+        from detector_server import RemoteBackend
+        return RemoteBackend(a.server)
+    return make_backend(a.backend, a.weights, a.device, a.imgsz, a.precision)
+
+
+def build_detector(model, a, roi_poly: np.ndarray | None, W0: int, H0: int) -> FrameDetector:
+    """옵션(--roi_crop / --detect_every / --gate_thresh)에 맞게 FrameDetector 구성"""
+    cropper = None
+    if a.roi_crop or a.roi_mask:
+        if roi_poly is None:
+            print("[WARN] --roi_crop/--roi_mask need --roi → full-frame inference")
+        else:
+            cropper = RoiCropper(roi_poly, W0, H0, mask=a.roi_mask)
+    tracker = None
+    if a.detect_every > 1 or (a.target_fps > 0 and a.adapt_max_detect_every > 1):
+        tracker = BoxTracker(roi_rect(roi_poly, W0, H0) if roi_poly is not None else None)
+    gate = None
+    if a.gate_thresh > 0:
+        gate = SceneGate(a.gate_thresh, a.gate_max_age, roi_poly, W0, H0)
+    return FrameDetector(model, a, cropper, tracker, gate)
+
+
+class Source:
+    """open_source() 결과. W, H = 디코딩된 프레임 크기 (ffmpeg scale/crop 이면 원본 W0, H0 와 다름)"""
+    def __init__(self, cap, W0: int, H0: int, fps: float, roi_poly: np.ndarray | None,
+                 mapping=None, crop: tuple[int, int, int, int] | None = None, frames: int = 0):
+        self.cap = cap
+        self.frames = frames  # 헤더의 프레임 수 (0 = 모름)
+        self.W0, self.H0 = W0, H0
+        self.fps = fps
+        self.roi_poly = roi_poly
+        self.mapping = mapping
+        self.crop = crop
+        if mapping is None:
+            self.W, self.H, self.det_roi = W0, H0, roi_poly
+        else:
+            self.W, self.H, self.det_roi = cap.W, cap.H, mapping.poly_to_view(roi_poly)
+
+
+def open_source(a, live_source: bool = False) -> Source:
+    """--decoder 에 맞게 소스 열기. ROI 는 원본 해상도 기준, detector 는 디코딩 좌표 (det_roi)"""
+    if a.decoder == "ffmpeg":
+        from ffmpeg_source import FFmpegSource, probe
+        W0, H0, fps = probe(a.source)
+        roi_poly = build_roi_polygon(parse_roi(a.roi), W0, H0)
+        crop = roi_rect(roi_poly, W0, H0) if a.decode_crop and roi_poly is not None else None
+        # 버퍼 ring: 큐 / 배치 / 저장 대기 중인 프레임보다 많아야 재사용해도 안전
+        n_buffers = 2 * a.queue_size + a.batch + (a.save_queue if a.save_video else 0) + 4
+        cap = FFmpegSource(a.source, W0, H0, fps, a.decode_width, crop, n_buffers, a.ffmpeg)
+        return Source(cap, W0, H0, fps, roi_poly, cap.mapping, crop)
+    # 첫 프레임에서 폭/높이 얻고 ROI polygon 구성 (live 소스는 되감기 불가)
+    cap, W0, H0 = open_video(a.source, rewind=not live_source)
+    roi_poly = build_roi_polygon(parse_roi(a.roi), W0, H0)
+    return Source(cap, W0, H0, cap.get(cv2.CAP_PROP_FPS) or 30.0, roi_poly,
+                  frames=max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))))
+
+
+# =========================
+# Runners
+# =========================
+def read_batch(cap, n: int, prof: Profiler | None = None) -> list[np.ndarray]:
+    frames = []
+    while len(frames) < n:
+        t0 = time.perf_counter()
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if prof is not None:
+            prof.add("decode", t0)
+        frames.append(frame)
+    return frames
+
+
+def run_serial(detect: FrameDetector, cap, post: FramePostProcessor, a):
+    while True:
+        frames = read_batch(cap, a.batch, post.prof)
+        if not frames:
+            break
+        for frame, raw in zip(frames, detect(frames)):
+            if not post(frame, raw):
+                return
+
+
+END = object()  # 파이프라인 종료 표식
+
+
+class StageThread(threading.Thread):
+    """파이프라인 워커. 예외는 저장해 두었다가 메인 스레드에서 다시 raise"""
+    def __init__(self, name: str, target):
+        super().__init__(name=name, daemon=True)
+        self._target_fn = target
+        self.error: BaseException | None = None
+
+    def run(self):
+        try:
+            self._target_fn()
+        except BaseException as e:
+            self.error = e
+
+
+def q_put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """stop 이 걸리면 포기하는 blocking put"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def q_get(q: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return END
+
+
+class LatestFrameGrabber:
+    """--live: grabber 스레드가 소스를 계속 읽고 가장 최근 프레임 1장만 보관
+    - 추론이 캡처보다 느려도 backlog 없음: 소비되기 전에 덮어쓴 프레임은 dropped 로 집계
+    - 프레임마다 캡처 시각(perf_counter) → capture-to-caption latency
+    - loop=True: 파일 끝에서 되감고 pace_fps 속도로 읽음 (파일로 live 소스 흉내)
+    - 버퍼를 돌려 쓰는 소스 (FFmpegSource) 는 프레임을 복사해서 보관
+      (grabber 는 소비 속도와 무관하게 계속 읽음 → 추론 중인 프레임의 버퍼를 덮어쓸 수 있음)
+    """
+    def __init__(self, cap, prof: Profiler, loop: bool = False, pace_fps: float = 0.0):
+        self.cap = cap
+        self.copy = getattr(cap, "reuses_buffers", False)
+        self.prof = prof
+        self.loop = loop
+        self.pace_fps = pace_fps
+        self.cond = threading.Condition()
+        self.item: tuple[int, float, np.ndarray] | None = None  # (seq, t_capture, frame)
+        self.seq = -1
+        self.consumed = -1
+        self.grabbed = 0
+        self.dropped = 0
+        self.done = False
+        self.stop = threading.Event()
+        self.thread = StageThread("grabber", self._loop)
+
+    def start(self):
+        self.thread.start()
+
+    def close(self):
+        self.stop.set()
+        self.thread.join()
+
+    def _loop(self):
+        period = 1.0 / self.pace_fps if self.pace_fps > 0 else 0.0
+        next_t = time.perf_counter()
+        rewound = False
+        try:
+            while not self.stop.is_set():
+                t0 = time.perf_counter()
+                ok, frame = self.cap.read()
+                if not ok:
+                    if self.loop and not rewound:
+                        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        rewound = True
+                        continue
+                    break
+                rewound = False
+                if self.copy:
+                    frame = frame.copy()
+                t_cap = self.prof.add("decode", t0)
+                with self.cond:
+                    if self.seq > self.consumed:
+                        self.dropped += 1  # 아무도 안 가져간 프레임 덮어씀
+                    self.seq += 1
+                    self.grabbed += 1
+                    self.item = (self.seq, t_cap, frame)
+                    self.cond.notify()
+                if period:
+                    next_t += period
+                    now = time.perf_counter()
+                    if next_t > now:
+                        time.sleep(next_t - now)
+                    else:
+                        next_t = now
+        finally:
+            with self.cond:
+                self.done = True
+                self.cond.notify_all()
+
+    def latest(self) -> tuple[int, float, np.ndarray] | None:
+        """새 프레임이 올 때까지 기다렸다가 가장 최근 것 반환. 소스 끝이면 None"""
+        with self.cond:
+            while self.seq <= self.consumed and not self.done:
+                self.cond.wait(0.1)
+            if self.seq <= self.consumed:
+                return None
+            self.consumed = self.seq
+            return self.item
+
+
+def run_live(detect: FrameDetector, grabber: LatestFrameGrabber, post: FramePostProcessor, a):
+    """항상 가장 최근 프레임만 추론 → 필터/자막/표시 (batch 1)"""
+    grabber.start()
+    try:
+        while True:
+            item = grabber.latest()
+            if item is None:
                 break
+            seq, t_cap, frame = item
+            post.frame_idx = seq  # 건너뛴 프레임도 셈 → --clock video / 이벤트 frame 이 캡처 기준
+            keep = post(frame, detect([frame])[0])
+            post.prof.add("e2e", t_cap)
+            post.dropped["live_stale"] = grabber.dropped
+            if not keep:
+                break
+    finally:
+        grabber.close()
+    if grabber.thread.error is not None:
+        raise grabber.thread.error
+
+
+def run_pipeline(detect: FrameDetector, cap, post: FramePostProcessor, a):
+    """decode / inference / 후처리+그리기 를 각각 다른 스레드에서 (bounded queue 로 연결)
+    - 큐는 FIFO, 각 단계는 워커 1개 → 프레임 순서와 자막 결과는 serial 과 동일
+    - cv2.imshow 는 메인 스레드에서만 호출
+    """
+    q_frames: queue.Queue = queue.Queue(maxsize=a.queue_size)
+    q_results: queue.Queue = queue.Queue(maxsize=a.queue_size)
+    post.queues.update(frames=q_frames, results=q_results)
+    stop = threading.Event()
+
+    def decode():
+        try:
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                post.prof.add("decode", t0)
+                if not q_put(q_frames, frame, stop):
+                    break
+        finally:
+            q_put(q_frames, END, stop)
 
-    cap.release()
-    cv2.destroyAllWindows()
+    def inference():
+        try:
+            done = False
+            while not done:
+                # 최대 a.batch 장 모아서 한 번에 추론
+                frames = []
+                while len(frames) < a.batch:
+                    frame = q_get(q_frames, stop)
+                    if frame is END:
+                        done = True
+                        break
+                    frames.append(frame)
+                if not frames:
+                    break
+                for item in zip(frames, detect(frames)):
+                    if not q_put(q_results, item, stop):
+                        return
+        finally:
+            q_put(q_results, END, stop)
+
+    workers = [StageThread("decode", decode), StageThread("inference", inference)]
+    for t in workers:
+        t.start()
+    try:
+        while True:
+            item = q_get(q_results, stop)
+            if item is END:
+                break
+            if not post(*item):
+                break
+    finally:
+        stop.set()
+        for t in workers:
+            t.join()
+    for t in workers:
+        if t.error is not None:
+            raise t.error
+
+
+def _limit_threads(a, n_procs: int):
+    """추론 프로세스 여러 개가 각자 전체 코어를 쓰면 oversubscription → CPU 추론은 코어를 나눠 씀"""
+    cv2.setNumThreads(1)
+    if a.backend == "torch" and a.device == "cpu" and not a.server:
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // n_procs))
+
+
+def _decode_proc(a, spec, tasks, results, free, stop, n_workers: int):
+    """--procs 디코더 프로세스: 빈 slot 을 기다렸다가 그 slot 에 직접 디코딩 → seq 를 워커에게"""
+    from frame_ring import FrameRing
+
+    ring = FrameRing.attach(spec)
+    src = open_source(a)
+    seq = 0
+    view = frame = None
+    try:
+        while not stop.is_set():
+            if not free.acquire(timeout=0.1):
+                continue
+            t0 = time.perf_counter()
+            view = ring.view(seq)
+            ok, frame = src.cap.read(view)
+            if not ok:
+                free.release()
+                break
+            if frame is not view:  # 백엔드가 다른 배열을 돌려준 경우만 복사
+                view[...] = frame
+            ring.publish(seq, (time.perf_counter() - t0) * 1000.0)
+            tasks.put(seq)
+            seq += 1
+        results.put(("end", seq))
+    except BaseException:
+        import traceback
+        results.put(("error", "decoder", traceback.format_exc()))
+    finally:
+        for _ in range(n_workers):
+            tasks.put(None)
+        src.cap.release()
+        view = frame = None
+        ring.close()
+
+
+def _infer_proc(a, spec, det_roi: np.ndarray | None, W: int, H: int, tasks, results, stop, name: str):
+    """--procs 추론 워커: 모델 따로 로딩, 최대 a.batch 개 seq 를 모아 slot view 로 추론 → 작은 검출 배열만 반환"""
+    from frame_ring import FrameRing
+
+    _limit_threads(a, a.procs)
+    ring = FrameRing.attach(spec)
+    try:
+        detect = build_detector(load_model(a), a, det_roi, W, H)
+        done = False
+        while not done:
+            seqs = [tasks.get()]
+            if seqs[0] is None or stop.is_set():
+                break
+            while len(seqs) < a.batch:
+                try:
+                    seq = tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if seq is None:
+                    done = True
+                    break
+                seqs.append(seq)
+            t0 = time.perf_counter()
+            raws = detect([ring.frame(q) for q in seqs])
+            results.put(("dets", seqs, (time.perf_counter() - t0) * 1000.0 / len(seqs), raws))
+    except BaseException:
+        import traceback
+        results.put(("error", name, traceback.format_exc()))
+    finally:
+        detect = None
+        ring.close()
+
+
+def run_procs(src: Source, post: FramePostProcessor, a):
+    """--procs N: 디코더 프로세스 1개 → shared memory frame ring → 추론 워커 프로세스 N개 → 여기(후처리/표시)
+    - 프로세스 간에는 seq 번호와 검출 배열만 오감 (프레임은 ring slot 에서 zero-copy)
+    - 워커 결과는 순서가 섞여 도착 → seq 순서로 다시 맞춘 뒤 후처리 (자막 결과는 serial 과 동일)
+    - slot 은 후처리가 끝난 seq 순서대로 반납 → 디코더는 최대 ring_slots 프레임까지 앞서 감
+    """
+    import multiprocessing as mp
+    from frame_ring import FrameRing
+
+    n_slots = a.ring_slots or 2 * a.procs * a.batch + a.queue_size
+    n_slots = max(n_slots, a.procs * a.batch + 1)  # 워커가 모두 배치를 채워도 디코더가 멈추지 않도록
+    ring = FrameRing(n_slots, (src.H, src.W, 3))
+    ctx = mp.get_context("spawn")  # Windows 와 같은 방식 (CUDA 도 fork 불가)
+    tasks, results = ctx.Queue(), ctx.Queue()
+    free = ctx.Semaphore(n_slots)
+    stop = ctx.Event()
+    post.queues.update(tasks=tasks, results=results)
+    procs = [ctx.Process(target=_decode_proc, name="decoder", daemon=True,
+                         args=(a, ring.spec, tasks, results, free, stop, a.procs))]
+    procs += [ctx.Process(target=_infer_proc, name=f"infer{i}", daemon=True,
+                          args=(a, ring.spec, src.det_roi, src.W, src.H, tasks, results, stop, f"infer{i}"))
+              for i in range(a.procs)]
+    print(f"[PROCS] decoder + {a.procs} inference workers, {n_slots} x {src.W}x{src.H} shared frame slots "
+          f"({ring.shm.size / 2 ** 20:.1f} MiB)")
+    for p in procs:
+        p.start()
+
+    pending: dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+    next_seq, total = 0, -1
+    frame = None
+    try:
+        while next_seq != total:
+            try:
+                msg = results.get(timeout=0.5)
+            except queue.Empty:
+                dead = [p.name for p in procs if p.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"--procs: process {', '.join(dead)} exited unexpectedly")
+                continue
+            if msg[0] == "error":
+                raise RuntimeError(f"--procs: {msg[1]} process failed\n{msg[2]}")
+            if msg[0] == "end":
+                total = msg[1]
+                continue
+            _, seqs, infer_ms, raws = msg
+            post.prof.record("infer", infer_ms, len(seqs))
+            pending.update(zip(seqs, raws))
+            while next_seq in pending:
+                post.prof.record("decode", ring.decode_ms(next_seq))
+                frame = ring.frame(next_seq)
+                if post.saver is not None:
+                    frame = frame.copy()  # 저장 큐가 그린 프레임을 참조 → slot 재사용 전에 떼어냄
+                keep = post(frame, pending.pop(next_seq))
+                frame = None
+                free.release()  # next_seq slot 반납
+                next_seq += 1
+                if not keep:
+                    return
+    finally:
+        frame = None
+        stop.set()
+        deadline = time.time() + 10.0
+        for p in procs:
+            # 큐에 남은 결과를 비워야 자식의 queue feeder 가 끝나고 프로세스가 종료됨
+            while p.is_alive() and time.time() < deadline:
+                try:
+                    results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+                p.join(timeout=0.1)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+        ring.close()
+
+
+def _segment_proc(a, seg: int, start: int, end: int, path: str):
+    """--segments 워커: [start, end) 프레임 추론 → 원시 검출을 .tldet 에 기록 (필터/자막은 merge 에서)
+    end=-1 이면 파일 끝까지. 반환 (seg, 프레임 수, 프레임별 모델 추론 여부, decode / infer 히스토그램, 초)
+    """
+    from detlog import DetLogWriter
+
+    t0 = time.perf_counter()
+    _limit_threads(a, a.segments)
+    src = open_source(a)
+    cap = src.cap
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    detect = build_detector(load_model(a), a, src.det_roi, src.W, src.H)
+    detect.frame_idx = start  # detect_every 키프레임은 영상 전체 기준 frame index
+    rec = DetLogWriter(path, {"W": src.W0, "H": src.H0, "fps": src.fps, "start": start})
+    fresh: list[bool] = []
+    idx = start
+    try:
+        while end < 0 or idx < end:
+            frames = read_batch(cap, a.batch if end < 0 else min(a.batch, end - idx), detect.prof)
+            if not frames:
+                break
+            for raw in detect(frames):
+                rec.write(idx, idx * 1000.0 / src.fps, raw)
+                idx += 1
+            fresh += detect.fresh
+    finally:
+        rec.close()
+        cap.release()
+    return (seg, idx - start, np.array(fresh, bool), detect.prof.hist["decode"], detect.prof.hist["infer"],
+            time.perf_counter() - t0)
+
+
+def _log_rows(log, lo: int, hi: int) -> np.ndarray:
+    """DetLog 에서 frame [lo, hi) 의 레코드 (sentinel 포함)"""
+    first = int(log.rows["frame"][0])
+    return log.rows[log.starts[lo - first]:log.ends[hi - 1 - first]]
+
+
+def run_segments(src: Source, post: FramePostProcessor, a):
+    """--segments N: 파일을 N 구간으로 나눠 프로세스 N 개가 동시에 추론 → 검출을 frame 순서로 이어 붙여
+    필터 + 자막 안정화는 처음부터 한 번에 (자막 / 이벤트 / 검출 기록은 serial --clock video 실행과 동일)
+    - 구간 경계는 batch / detect_every 의 배수 → 배치 구성과 키프레임이 serial 과 같음
+    - --gate_thresh 는 지난 프레임에 따라 결정이 달라짐 → 구간 앞에 warm-up 프레임을 더 추론하고,
+      겹치는 프레임 중 양쪽 모두 새로 추론한 배치 시작 프레임(이후 상태가 같아짐)에서 이어 붙임
+      (gate 강제 추론은 영상 기준 frame index 라 warm-up 이 강제 주기 이상이면 그런 프레임이 항상 있음)
+    """
+    import multiprocessing as mp
+    import shutil
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from detlog import DetLog
+
+    n = src.frames
+    if n <= 0:
+        raise RuntimeError("--segments needs a video file with a known frame count")
+    align = math.lcm(a.batch, a.detect_every)
+    seg_len = -(-n // a.segments)
+    seg_len = -(-seg_len // align) * align
+    warm = 0
+    if a.gate_thresh > 0:
+        # gate 는 (max_age + 1) * detect_every 프레임마다 강제 추론 → 그 주기와 align 의 공배수 프레임은
+        # 양쪽 모두 새로 추론한 배치 시작 프레임 → warm-up 이 그 길이 이상이면 항상 이어 붙일 수 있음
+        period = math.lcm(align, (a.gate_max_age + 1) * a.detect_every)
+        warm = -(-max(a.segment_warmup, period) // align) * align
+    starts = list(range(0, n, seg_len))
+    # (구간, 추론 시작(warm-up 포함), 끝). 마지막 구간은 파일 끝까지 (frame count 는 헤더 값이라 근사일 수 있음)
+    jobs = [(i, max(0, s - warm), s + seg_len if i < len(starts) - 1 else -1) for i, s in enumerate(starts)]
+
+    work = Path(a.segment_dir) if a.segment_dir else Path(tempfile.mkdtemp(prefix="tl_segments_"))
+    work.mkdir(parents=True, exist_ok=True)
+    paths = [work / f"{Path(a.source).stem}_seg{i:03d}.tldet" for i in range(len(jobs))]
+    print(f"[SEGMENTS] {n} frames → {len(jobs)} segments x {seg_len} frames (warm-up {warm}) → {work}")
+    fresh: dict[int, np.ndarray] = {}
+    t0 = time.perf_counter()
+    post.prof.start()  # 처리 FPS 는 병렬 추론 시작부터 (merge 의 tick 만 세면 merge 속도가 됨)
+    try:
+        with ProcessPoolExecutor(max_workers=len(jobs), mp_context=mp.get_context("spawn")) as pool:
+            futures = {pool.submit(_segment_proc, a, i, s0, e, str(paths[i])): s0 for i, s0, e in jobs}
+            for fut in as_completed(futures):
+                seg, frames, fresh[seg], h_decode, h_infer, dt = fut.result()
+                post.prof.hist["decode"].merge(h_decode)
+                post.prof.hist["infer"].merge(h_infer)
+                s0 = futures[fut]
+                print(f"[SEG {seg}] frames {s0}-{s0 + frames - 1} in {dt:.1f}s ({frames / max(1e-6, dt):.1f} fps)")
+        print(f"[SEGMENTS] inference done in {time.perf_counter() - t0:.1f}s")
+
+        # 이어 붙일 frame: 구간 i 는 cuts[i] 부터 (이전 구간과 상태가 같아진 첫 프레임)
+        logs = [DetLog(str(p)) for p in paths]
+        cuts = [0]
+        for i in range(1, len(jobs)):
+            s, s0 = starts[i], jobs[i][1]
+            cut = s
+            if warm:
+                prev0 = jobs[i - 1][1]
+                synced = [j for j in range(s0, s, align) if fresh[i - 1][j - prev0] and fresh[i][j - s0]]
+                if synced:
+                    cut = synced[0]
+                    if not np.array_equal(_log_rows(logs[i - 1], cut, s), _log_rows(logs[i], cut, s)):
+                        print(f"[WARN] segment {i}: overlap detections differ from segment {i - 1} "
+                              f"(inexact seek?) → result may differ from a serial run")
+                else:
+                    print(f"[WARN] segment {i}: no common fresh keyframe in the {warm} warm-up frames "
+                          f"→ result may differ from a serial run")
+            cuts.append(cut)
+        cuts.append(math.inf)
+
+        # 필터 + 자막 안정화 (serial, 프레임 순서대로)
+        last: str | None = None
+        for i, log in enumerate(logs):
+            for idx, t_ms, raw in log:
+                if idx < cuts[i]:
+                    continue
+                if idx >= cuts[i + 1]:
+                    break
+                post.prof.tick()
+                post.frame_idx = idx
+                post.step(raw, src.W0, src.H0, t_ms)
+                caption = post.stabilizer.stable_caption
+                if caption != last:
+                    print(f"frame {idx} ({idx / post.fps:.2f}s): {caption}")
+                    last = caption
+        del logs  # memmap 닫기 (Windows 는 열린 파일 삭제 불가)
+    finally:
+        if not a.segment_dir:
+            shutil.rmtree(work, ignore_errors=True)
+    dt = time.perf_counter() - t0
+    print(f"[SEGMENTS] {post.frame_idx} frames in {dt:.1f}s ({post.frame_idx / max(1e-6, dt):.1f} fps)")
+
+
+def close_outputs(post: FramePostProcessor):
+    if post.saver is not None:
+        post.saver.close()
+        print(f"[SAVE] {post.saver.report()}")
+    if post.recorder is not None:
+        post.recorder.close()
+        print(f"[REC] {post.recorder.frames} frames → {post.recorder.path}")
+    if post.events is not None:
+        post.events.close()
+        print(f"[EVENTS] {post.events.frames} frames, {post.events.changes} caption changes → {post.events.path}")
+
+
+def report_profile(prof: Profiler, a):
+    if a.profile:
+        print(prof.table())
+    if a.profile_json:
+        Path(a.profile_json).parent.mkdir(parents=True, exist_ok=True)
+        with open(a.profile_json, "w", encoding="utf-8") as f:
+            json.dump(prof.summary(), f, indent=2)
+        print(f"[PROFILE] saved to: {a.profile_json}")
+
+
+def run_replay(a):
+    """--replay_dets: 기록된 원시 검출 → 필터 + 자막 안정화만 (모델/디코딩 없음)
+    디바운스는 기록된 timestamp (--clock video 면 frame index / fps)
+    """
+    from detlog import DetLog
+
+    log = DetLog(a.replay_dets)
+    W, H = int(log.meta["W"]), int(log.meta["H"])
+    fps = float(log.meta.get("fps") or 30.0)
+    if a.conf < float(log.meta.get("conf", 0.0)):
+        print(f"[WARN] --conf {a.conf} < recorded conf {log.meta['conf']} → "
+              f"detections below {log.meta['conf']} are not in the log")
+    roi_poly = build_roi_polygon(parse_roi(a.roi), W, H)
+    post = FramePostProcessor(a, roi_poly, fps=fps)
+    if a.events:
+        post.events = EventWriter(a.events, a.events_dets)
+
+    last: str | None = None
+    t0 = time.perf_counter()
+    try:
+        for idx, t_ms, raw in log:
+            post.frame_idx = idx
+            post.prof.tick()
+            post.step(raw, W, H, idx * 1000.0 / fps if a.clock == "video" else t_ms)
+            caption = post.stabilizer.stable_caption
+            if caption != last:
+                print(f"frame {idx} ({idx / fps:.2f}s): {caption}")
+                last = caption
+    finally:
+        close_outputs(post)
+    dt = max(1e-6, time.perf_counter() - t0)
+    print(f"[REPLAY] {len(log)} frames in {dt:.2f}s ({len(log) / dt:.0f} fps)")
+    report_profile(post.prof, a)
+
+
+# =========================
+# Main
+# =========================
+def main(argv: list[str] | None = None):
+    a = parse_args(argv)
+    a.batch = max(1, a.batch)
+
+    if a.replay_dets:
+        run_replay(a)
+        return
+
+    # 모델/소스 체크
+    if not a.server and not Path(a.weights).exists():
+        raise FileNotFoundError(f"Weights not found: {a.weights}")
+    live_source = is_live_source(a.source)
+    if not live_source and not Path(a.source).exists():
+        raise FileNotFoundError(f"Source not found: {a.source}")
+    if live_source and not a.live:
+        print("[WARN] live source without --live → every frame is processed in order (backlog may grow)")
+
+    if a.procs > 0 and a.live:
+        print("[WARN] --procs is ignored with --live (latest-frame mode runs in one process)")
+        a.procs = 0
+    if a.procs > 0 and (a.detect_every > 1 or a.gate_thresh > 0):
+        print("[WARN] --procs: --detect_every / --gate_thresh need frames in order on one worker → disabled")
+        a.detect_every, a.gate_thresh = 1, 0.0
+
+    if a.target_fps > 0 and (a.procs > 0 or a.segments > 1):
+        print("[WARN] --target_fps is ignored with --procs / --segments (throughput modes)")
+        a.target_fps = 0.0
+    if a.segments > 1:
+        if live_source or a.live:
+            raise ValueError("--segments needs a video file (not a live source)")
+        if a.decoder != "cv2" or a.procs > 0 or a.show or a.save_video:
+            print("[WARN] --segments: decoder cv2 (frame seek), no --procs / --show / --save_video")
+            a.decoder, a.procs, a.show, a.save_video = "cv2", 0, False, False
+        if a.clock != "video":
+            print("[INFO] --segments: --clock video (wall time has no meaning across processes)")
+            a.clock = "video"
+
+    src = open_source(a, live_source)
+    cap, W0, H0, roi_poly = src.cap, src.W0, src.H0, src.roi_poly
+    if src.mapping is not None:
+        print(f"[DECODE] ffmpeg {W0}x{H0} → {src.W}x{src.H}" + (f" (crop {src.crop})" if src.crop else ""))
+    post = FramePostProcessor(a, roi_poly, fps=src.fps)
+    post.mapping = src.mapping
+    if a.procs > 0 or a.segments > 1:
+        # 디코더 / 추론은 자식 프로세스가 소스와 모델을 각자 엶 → 여기서는 크기만 확인
+        cap.release()
+        cap, detect = None, None
+    else:
+        detect = build_detector(load_model(a), a, src.det_roi, src.W, src.H)
+        detect.prof = post.prof
+        if a.target_fps > 0:
+            detect.adapt = ResolutionController(a, post.prof, post.fps, overlapped=a.pipeline and not a.live)
+    gate = detect.gate if detect is not None else None
+    adapt = detect.adapt if detect is not None else None
+    if a.record_dets:
+        from detlog import DetLogWriter
+        post.recorder = DetLogWriter(a.record_dets, {
+            "W": W0, "H": H0, "fps": post.fps, "source": str(a.source),
+            "weights": str(a.weights), "backend": a.backend, "imgsz": a.imgsz, "conf": a.conf, "iou": a.iou,
+        })
+    if a.events:
+        post.events = EventWriter(a.events, a.events_dets)
+    if a.save_video:
+        post.saver = VideoSaver(str(Path(a.save_dir) / f"{a.name}.mp4"), post.fps, (src.W, src.H),
+                                a.save_queue, a.save_policy)
+        post.render = True
+    metrics = None
+    if a.metrics_port or a.metrics_file:
+        from metrics import LiveMetrics
+        metrics = LiveMetrics(post, GROUP_PRIORITY)
+        if a.metrics_port:
+            metrics.serve(a.metrics_port)
+        if a.metrics_file:
+            metrics.write_file(a.metrics_file, a.metrics_interval)
+        metrics.start()
+
+    grabber = None
+    if a.live:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # 드라이버 버퍼도 최소로 (지원하는 백엔드만)
+        pace = post.fps if a.live_loop and not live_source else 0.0
+        grabber = LatestFrameGrabber(cap, post.prof, loop=a.live_loop, pace_fps=pace)
+
+    try:
+        if grabber is not None:
+            run_live(detect, grabber, post, a)
+        elif a.segments > 1:
+            run_segments(src, post, a)
+        elif a.procs > 0:
+            run_procs(src, post, a)
+        elif a.pipeline:
+            run_pipeline(detect, cap, post, a)
+        else:
+            run_serial(detect, cap, post, a)
+    finally:
+        if cap is not None:
+            cap.release()
+        cv2.destroyAllWindows()
+        if metrics is not None:
+            metrics.close()
+        close_outputs(post)
+        if gate is not None:
+            total = max(1, gate.inferred + gate.reused)
+            print(f"[GATE] inferred {gate.inferred}, reused {gate.reused} "
+                  f"({100.0 * gate.reused / total:.1f}% skipped)")
+        if adapt is not None:
+            adapt.close()
+            print(f"[ADAPT] {adapt.report()}" + (f" → {a.adapt_log}" if a.adapt_log else ""))
+        if grabber is not None:
+            print(f"[LIVE] grabbed {grabber.grabbed}, processed {post.processed}, "
+                  f"dropped {grabber.dropped} stale frames")
+        report_profile(post.prof, a)
 
 
 if __name__ == "__main__":